@@ -13,4 +13,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from tracker.services.twilio import aclose_twilio_client, start_async_twilio_client  # noqa: E402 (needs the app registry)
+
+
+async def application(scope, receive, send):
+    # Django does not speak the ASGI lifespan protocol; answer it here so the
+    # shared async Twilio client is bound to the worker's loop at startup and
+    # closed when the worker shuts down.
+    if scope["type"] != "lifespan":
+        await django_application(scope, receive, send)
+        return
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_async_twilio_client()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aclose_twilio_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,21 @@
+# Server hooks shared by gunicorn.conf.py and gunicorn.asgi.conf.py. When
+# PROMETHEUS_MULTIPROC_DIR is set, every worker writes its metric samples to
+# that directory and /metrics sums them; these hooks keep it consistent.
+import os
+import shutil
+
+
+def on_starting(server):
+    # Runs once in the master before any worker imports the metrics module,
+    # which needs the directory to exist.
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
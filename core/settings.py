@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -159,3 +160,60 @@ TWILIO_ACCOUNT_SID = env("TWILIO_ACCOUNT_SID", default="")
 TWILIO_AUTH_TOKEN = env("TWILIO_AUTH_TOKEN", default="")
 TWILIO_WHATSAPP_FROM = env("TWILIO_WHATSAPP_FROM", default="whatsapp:+14155238886")
 TWILIO_VALIDATE_SIGNATURE = env.bool("TWILIO_VALIDATE_SIGNATURE", default=False)
+
+PARSE_CACHE_SIZE = env.int("PARSE_CACHE_SIZE", default=1024)
+# "sequential" tries each candidate pattern in turn; "combined" scans once.
+PARSER_ENGINE = env("PARSER_ENGINE", default="sequential")
+
+TWILIO_OUTBOUND_QUEUE = env.bool("TWILIO_OUTBOUND_QUEUE", default=False)
+OUTBOUND_MAX_ATTEMPTS = env.int("OUTBOUND_MAX_ATTEMPTS", default=5)
+OUTBOUND_BACKOFF_SECONDS = env.float("OUTBOUND_BACKOFF_SECONDS", default=2.0)
+OUTBOUND_BACKOFF_MAX_SECONDS = env.float("OUTBOUND_BACKOFF_MAX_SECONDS", default=300.0)
+OUTBOUND_LEASE_SECONDS = env.int("OUTBOUND_LEASE_SECONDS", default=300)
+
+TWILIO_API_BASE_URL = env("TWILIO_API_BASE_URL", default="")
+TWILIO_HTTP_CONNECT_TIMEOUT = env.float("TWILIO_HTTP_CONNECT_TIMEOUT", default=3.05)
+TWILIO_HTTP_READ_TIMEOUT = env.float("TWILIO_HTTP_READ_TIMEOUT", default=10.0)
+TWILIO_HTTP_POOL_SIZE = env.int("TWILIO_HTTP_POOL_SIZE", default=10)
+TWILIO_HTTP_MAX_RETRIES = env.int("TWILIO_HTTP_MAX_RETRIES", default=0)
+
+IDEMPOTENCY_CACHE_SIZE = env.int("IDEMPOTENCY_CACHE_SIZE", default=10000)
+IDEMPOTENCY_CACHE_TTL_SECONDS = env.int("IDEMPOTENCY_CACHE_TTL_SECONDS", default=600)
+USER_CACHE_SIZE = env.int("USER_CACHE_SIZE", default=10000)
+USER_CACHE_TTL_SECONDS = env.int("USER_CACHE_TTL_SECONDS", default=60)
+
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# "inline" handles messages inside the webhook; "queue" only stores them for
+# the process_inbound workers.
+WEBHOOK_PROCESSING_MODE = env("WEBHOOK_PROCESSING_MODE", default="inline")
+
+RATE_LIMIT_ENABLED = env.bool("RATE_LIMIT_ENABLED", default=True)
+# "local" keeps buckets in each process; "database" shares them across workers.
+RATE_LIMIT_BACKEND = env("RATE_LIMIT_BACKEND", default="local")
+RATE_LIMIT_LOCAL_MAX_KEYS = env.int("RATE_LIMIT_LOCAL_MAX_KEYS", default=10000)
+RATE_LIMIT_WRITE_BURST = env.int("RATE_LIMIT_WRITE_BURST", default=20)
+RATE_LIMIT_WRITE_PER_MINUTE = env.float("RATE_LIMIT_WRITE_PER_MINUTE", default=30)
+RATE_LIMIT_READ_BURST = env.int("RATE_LIMIT_READ_BURST", default=30)
+RATE_LIMIT_READ_PER_MINUTE = env.float("RATE_LIMIT_READ_PER_MINUTE", default=60)
+
+# The CSV upload endpoint is disabled unless a token is configured.
+IMPORT_TOKEN = env("IMPORT_TOKEN", default="")
+# Uploads are staged here for the process_imports worker; web and worker
+# processes must share it.
+IMPORT_STAGING_DIR = env("IMPORT_STAGING_DIR", default=str(Path(tempfile.gettempdir()) / "expense-bot-imports"))
+
+# Identical expenses created within this many minutes are flagged; 0 disables.
+DUPLICATE_WINDOW_MINUTES = env.int("DUPLICATE_WINDOW_MINUTES", default=10)
+
+# Replies to read-only intents are cached per user under a generation stored
+# on the user row, so any worker's write invalidates them even when each
+# process keeps its own local-memory cache.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+RESPONSE_CACHE_TTL_SECONDS = env.int("RESPONSE_CACHE_TTL_SECONDS", default=300)
+
+# Base URL used to build absolute links in replies, e.g. https://bot.example.com.
+# Ledger export links are refused while it is empty.
+PUBLIC_BASE_URL = env("PUBLIC_BASE_URL", default="")
+EXPORT_LINK_MAX_AGE_SECONDS = env.int("EXPORT_LINK_MAX_AGE_SECONDS", default=86400)
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", default=2000)
@@ -0,0 +1,18 @@
+# ASGI deployment profile. Serves core.asgi:application with uvicorn workers so
+# the async webhook (/webhook/whatsapp/async/) can hold many conversations open
+# per worker while Twilio round trips are in flight:
+#
+#   gunicorn -c gunicorn.asgi.conf.py core.asgi:application
+import os
+
+from core import gunicorn_hooks
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+on_starting = gunicorn_hooks.on_starting
+child_exit = gunicorn_hooks.child_exit
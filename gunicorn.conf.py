@@ -0,0 +1,5 @@
+# Loaded automatically by gunicorn from the working directory.
+from core import gunicorn_hooks
+
+on_starting = gunicorn_hooks.on_starting
+child_exit = gunicorn_hooks.child_exit
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Account, Card, Category, Expense, Message, WhatsAppUser
+from .models import Account, Card, Category, Expense, Message, OutboundMessage, WhatsAppUser
 
 admin.site.register(WhatsAppUser)
 admin.site.register(Account)
@@ -8,3 +8,4 @@ admin.site.register(Card)
 admin.site.register(Category)
 admin.site.register(Expense)
 admin.site.register(Message)
+admin.site.register(OutboundMessage)
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class TrackerConfig(AppConfig):
     name = 'tracker'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        # Connects the signal handlers that keep the sender -> user cache fresh.
+        from .services import webhook  # noqa: F401
+        from .services.instrumentation import install_query_counter
+
+        connection_created.connect(install_query_counter, dispatch_uid="tracker_query_counter")
@@ -0,0 +1,111 @@
+import json
+import platform
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tracker.models import Category, Expense, SpendRollup, WhatsAppUser
+from tracker.services.analytics import spending_insights
+from tracker.services.rollups import rebuild_rollups
+
+_CATEGORIES = ["groceries", "electricity", "fuel", "rent", "snacks", "eating out", "tea"]
+_HISTORY_DAYS = 15 * 31
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _best(func, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark spending insights against synthetic expense histories. Everything "
+        "runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            action="append",
+            help="Expenses per run; repeat for several sizes (default: 10k, 100k and 1M).",
+        )
+        parser.add_argument("--seed", type=int, default=1234)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the best is kept.")
+        parser.add_argument("--output", help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        sizes = options["size"] or [10_000, 100_000, 1_000_000]
+        if any(size <= 0 for size in sizes) or options["repeat"] <= 0:
+            raise CommandError("--size and --repeat must be positive.")
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "seed": options["seed"],
+            "repeat": options["repeat"],
+            "sizes": {},
+        }
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    results["sizes"][size] = self._run(size, options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            values = results["sizes"][size]
+            self.stdout.write(
+                f"{size:>9,} expenses: {values['rollup_rows']:,} rollup rows, "
+                f"insights {values['insights_seconds'] * 1000:.1f} ms in {values['queries']} queries "
+                f"(rollup rebuild {values['rebuild_seconds']:.1f}s)"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def _run(self, size: int, options) -> dict:
+        rng = random.Random(options["seed"])
+        today = timezone.localdate()
+        user = WhatsAppUser.objects.create(phone_number=f"bench:analytics:{size}")
+        categories = [Category.objects.create(user=user, name=name) for name in _CATEGORIES]
+        Expense.objects.bulk_create(
+            (
+                Expense(
+                    user=user,
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    date=today - timedelta(days=rng.randrange(_HISTORY_DAYS)),
+                    category=rng.choice(categories),
+                    source_type=Expense.SOURCE_CASH,
+                )
+                for _ in range(size)
+            ),
+            batch_size=5000,
+        )
+        start = time.perf_counter()
+        rebuild_rollups(user)
+        rebuild_seconds = time.perf_counter() - start
+        with CaptureQueriesContext(connection) as queries:
+            spending_insights(user)
+        return {
+            "rollup_rows": SpendRollup.objects.filter(user=user).count(),
+            "rebuild_seconds": rebuild_seconds,
+            "insights_seconds": _best(lambda: spending_insights(user), options["repeat"]),
+            "queries": len(queries),
+        }
@@ -0,0 +1,210 @@
+import json
+import platform
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tracker.services.regex_parser import (
+    PARSER_ENGINES,
+    PATTERNS,
+    parse_message,
+    preprocess_message,
+)
+from tracker.services.parse_cache import get_parse_cache
+
+
+_NAMES = ["hdfc", "sbi", "wallet", "icici bank", "axis", "petty", "amex gold"]
+_CATEGORIES = ["groceries", "electricity", "fuel", "rent", "snacks", "eating out", "tea"]
+_MONTHS = ["jan", "february", "march", "sep", "december"]
+
+_VALID_TEMPLATES = [
+    "spent {amount} on {category} from {name} card",
+    "Paid Rs. {amount} on {category} from {name} card last4 {last4} on 2024-09-01",
+    "spent {amount} {currency} on {category} from {name} account",
+    "bought {amount} on {category} from {name} cash on 01/02/2024",
+    "update expense {id} amount {amount} category {category} source {name} card",
+    "delete expense {id}",
+    "balance of {name} account",
+    "balance of {name} card last4 {last4}",
+    "show expenses for {month} 2024",
+    "summary expenses this month",
+    "available credit for {name} card",
+    "list accounts",
+    "show cards",
+    "list transactions",
+    "add account {name} account balance {amount}",
+    "add card {name} limit {amount} cycle 5 last4 {last4}",
+    "list categories",
+    "add loan {name} amount {amount} description home renovation",
+    "pay loan {name} amount {amount} on 2024-01-15",
+    "list loans",
+    "help cards",
+    "set currency {currency}",
+]
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        amount=rng.choice(["12", "450", "1200.50", "99999"]),
+        category=rng.choice(_CATEGORIES),
+        name=rng.choice(_NAMES),
+        last4=f"{rng.randint(0, 9999):04d}",
+        currency=rng.choice(["usd", "eur", "inr"]),
+        id=rng.randint(1, 5000),
+        month=rng.choice(_MONTHS),
+    )
+
+
+def _near_miss(message: str, rng: random.Random) -> str:
+    words = message.split()
+    mutation = rng.randrange(4)
+    if mutation == 0 and len(words) > 1:
+        del words[rng.randrange(len(words))]
+    elif mutation == 1:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(["please", "x", "the", "99"]))
+    elif mutation == 2:
+        index = rng.randrange(len(words))
+        words[index] = words[index][:-1] or "z"
+    else:
+        words.append(rng.choice(["card", "now", "on 2024-13-45"]))
+    return " ".join(words)
+
+
+def _garbage(rng: random.Random) -> str:
+    alphabet = string.ascii_letters + string.digits + " .,!?₹"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 80)))
+
+
+def _worst_case() -> list[str]:
+    # Long runs of short words push the [a-z0-9 ]{1,30} groups to try every
+    # split point before the trailing keyword fails to match.
+    run = " ".join(["a1"] * 10)
+    return [
+        f"spent 100 on {'ab ' * 10}x from {run} crd",
+        f"spent 100 inr on {'ab ' * 10}x from {run} cardx",
+        f"update expense 1 amount 5 category {'ab ' * 10}x source {run} card last4 12",
+        f"balance of {run} {run}",
+        f"outstanding for {run} card last4",
+        f"add card {run} card limit",
+        f"add account {run} account balance x",
+        f"pay loan {run} {run} amount",
+    ]
+
+
+def build_corpus(size: int, seed: int) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    valid = [_fill(rng.choice(_VALID_TEMPLATES), rng) for _ in range(size)]
+    near_miss = [_near_miss(rng.choice(valid), rng) for _ in range(size)]
+    garbage = [_garbage(rng) for _ in range(size)]
+    worst_case = _worst_case() * max(1, size // 50)
+    return {
+        "valid": valid,
+        "near_miss": near_miss,
+        "garbage": garbage,
+        "worst_case": worst_case,
+    }
+
+
+def _timed(func, messages: list[str], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            try:
+                func(message)
+            except ValueError:
+                # Out-of-range dates such as 2024-13-45 fail during conversion.
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Benchmark the regex parser against a synthetic message corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=5000, help="Messages per corpus class.")
+        parser.add_argument("--seed", type=int, default=1234)
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is kept.")
+        parser.add_argument("--output", help="Write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        if options["size"] <= 0 or options["repeat"] <= 0:
+            raise CommandError("--size and --repeat must be positive.")
+        repeat = options["repeat"]
+        corpus = build_corpus(options["size"], options["seed"])
+        normalized = {name: [preprocess_message(m) for m in messages] for name, messages in corpus.items()}
+        everything = [message for messages in normalized.values() for message in messages]
+
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "seed": options["seed"],
+            "repeat": repeat,
+            "corpus": {name: len(messages) for name, messages in corpus.items()},
+            "preprocess": {},
+            "parse": {},
+            "patterns": {},
+        }
+
+        for name, messages in corpus.items():
+            elapsed = _timed(preprocess_message, messages, repeat)
+            results["preprocess"][name] = {
+                "seconds": elapsed,
+                "us_per_message": elapsed / len(messages) * 1e6,
+            }
+
+        for engine, parse in PARSER_ENGINES.items():
+            results["parse"][engine] = {}
+            for name, messages in normalized.items():
+                elapsed = _timed(parse, messages, repeat)
+                results["parse"][engine][name] = {
+                    "seconds": elapsed,
+                    "messages_per_second": len(messages) / elapsed if elapsed else None,
+                }
+
+        cache = get_parse_cache()
+        cache.clear()
+        elapsed = _timed(parse_message, corpus["valid"], repeat)
+        results["cached_parse_message"] = {
+            "seconds": elapsed,
+            "messages_per_second": len(corpus["valid"]) / elapsed if elapsed else None,
+            "cache": cache.stats(),
+        }
+
+        for spec in PATTERNS:
+            pattern = spec["pattern"]
+            pattern_results = {}
+            for name, messages in normalized.items():
+                elapsed = _timed(pattern.match, messages, repeat)
+                pattern_results[name] = {"us_per_message": elapsed / len(messages) * 1e6}
+            elapsed = _timed(pattern.match, everything, repeat)
+            pattern_results["total_seconds"] = elapsed
+            results["patterns"][spec["name"]] = pattern_results
+
+        for engine, corpora in results["parse"].items():
+            rates = ", ".join(
+                f"{name} {values['messages_per_second']:,.0f}/s" for name, values in corpora.items()
+            )
+            self.stdout.write(f"{engine} engine: {rates}")
+        preprocess_rate = results["preprocess"]["valid"]["us_per_message"]
+        self.stdout.write(f"preprocess_message: {preprocess_rate:.2f} us/message (valid corpus)")
+        slowest = sorted(
+            results["patterns"].items(),
+            key=lambda item: item[1]["total_seconds"],
+            reverse=True,
+        )[:5]
+        for name, values in slowest:
+            self.stdout.write(
+                f"  {name}: {values['total_seconds'] * 1000:.1f} ms total, "
+                f"worst case {values['worst_case']['us_per_message']:.2f} us/message"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
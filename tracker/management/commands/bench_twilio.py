@@ -0,0 +1,113 @@
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from twilio.rest import Client
+
+from tracker.services.twilio import (
+    reset_twilio_client,
+    send_whatsapp_message,
+    transport_stats,
+)
+
+
+class _FakeTwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.0
+    counter = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if self.delay:
+            time.sleep(self.delay)
+        type(self).counter += 1
+        body = json.dumps({"sid": f"SM{self.counter:032d}", "status": "queued"}).encode("utf-8")
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Measure Twilio send latency with and without the pooled HTTP transport."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200)
+        parser.add_argument("--to", default="whatsapp:+10000000000")
+        parser.add_argument("--fake", action="store_true", help="Send to a local fake Twilio API server.")
+        parser.add_argument("--fake-delay", type=float, default=0.0, help="Server-side delay per request in seconds.")
+
+    def handle(self, *args, **options):
+        if options["count"] <= 0:
+            raise CommandError("--count must be positive.")
+        server = None
+        overrides = {}
+        if options["fake"]:
+            _FakeTwilioHandler.delay = options["fake_delay"]
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTwilioHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            overrides = {
+                "TWILIO_API_BASE_URL": f"http://127.0.0.1:{server.server_port}",
+                "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+                "TWILIO_AUTH_TOKEN": "fake-token",
+            }
+        elif not settings.TWILIO_API_BASE_URL:
+            raise CommandError("Use --fake or point TWILIO_API_BASE_URL at a test server.")
+
+        try:
+            with override_settings(**overrides):
+                unpooled = self._run(self._send_unpooled, options)
+                reset_twilio_client()
+                transport_stats.reset()
+                pooled = self._run(lambda to, body: send_whatsapp_message(to, body), options)
+                stats = transport_stats.snapshot()
+                reset_twilio_client()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        for label, samples in (("unpooled", unpooled), ("pooled", pooled)):
+            self.stdout.write(
+                f"{label}: mean {statistics.mean(samples) * 1000:.2f} ms, "
+                f"p50 {_percentile(samples, 50) * 1000:.2f} ms, "
+                f"p99 {_percentile(samples, 99) * 1000:.2f} ms"
+            )
+        saved = statistics.mean(unpooled) - statistics.mean(pooled)
+        self.stdout.write(f"saved per send: {saved * 1000:.2f} ms")
+        self.stdout.write(
+            f"pooled transport: {stats['requests']} requests, "
+            f"{stats['connections_opened']} connections opened, "
+            f"{stats['connections_reused']} reused"
+        )
+
+    def _send_unpooled(self, to_number: str, body: str):
+        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        if settings.TWILIO_API_BASE_URL:
+            client.api.base_url = settings.TWILIO_API_BASE_URL
+        client.messages.create(from_=settings.TWILIO_WHATSAPP_FROM, to=to_number, body=body)
+
+    def _run(self, send, options) -> list[float]:
+        samples = []
+        for index in range(options["count"]):
+            start = time.perf_counter()
+            send(options["to"], f"benchmark message {index}")
+            samples.append(time.perf_counter() - start)
+        return samples
@@ -0,0 +1,54 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.models import WhatsAppUser
+from tracker.services.exports import EXPORT_FORMATS, stream_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every account, expense and loan payment to one file per user. "
+        "Exports all users unless phone numbers are given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("phone_numbers", nargs="*", help="Senders to export, e.g. whatsapp:+14155552671.")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output-dir", default="exports")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] is not None and options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+        export_format = options["format"]
+        output_dir = Path(options["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        users = WhatsAppUser.objects.order_by("id")
+        if options["phone_numbers"]:
+            users = users.filter(phone_number__in=options["phone_numbers"])
+
+        started_at = time.monotonic()
+        exported = 0
+        total_bytes = 0
+        for user in users.iterator():
+            path = output_dir / f"{user.pk}.{export_format}"
+            partial = path.with_suffix(path.suffix + ".part")
+            # Chunks go straight to disk and the file only appears under its
+            # final name once complete.
+            with open(partial, "w", newline="", encoding="utf-8") as handle:
+                for chunk in stream_ledger(user, export_format, options["chunk_size"]):
+                    handle.write(chunk)
+            os.replace(partial, path)
+            size = path.stat().st_size
+            total_bytes += size
+            exported += 1
+            self.stdout.write(f"{user.phone_number}: {path} ({size} bytes)")
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            f"Exported {exported} user(s), {total_bytes} bytes in {elapsed:.1f}s to {output_dir}."
+        )
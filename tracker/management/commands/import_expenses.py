@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.services.errors import ValidationError
+from tracker.services.imports import ImportStats, import_expenses
+from tracker.services.webhook import get_or_create_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Import expenses for a user from a CSV with columns date, amount, category, source, "
+        "source_type and optionally card_last4, currency and note."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("phone_number", help="Sender as stored on the user, e.g. whatsapp:+14155552671.")
+        parser.add_argument("path", help="CSV file to import, or - for stdin.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive.")
+        user = get_or_create_user(options["phone_number"])
+
+        def report(stats: ImportStats):
+            self.stdout.write(
+                f"{stats.rows} rows read, {stats.imported} imported, {stats.skipped} skipped "
+                f"({stats.rows_per_second:.0f} rows/s)"
+            )
+
+        try:
+            if options["path"] == "-":
+                stats = import_expenses(user, sys.stdin, options["batch_size"], report)
+            else:
+                with open(options["path"], newline="", encoding="utf-8-sig") as handle:
+                    stats = import_expenses(user, handle, options["batch_size"], report)
+        except (OSError, ValidationError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for error in stats.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            f"Imported {stats.imported} of {stats.rows} row(s) in {stats.elapsed:.1f}s "
+            f"({stats.rows_per_second:.0f} rows/s)."
+        )
@@ -0,0 +1,38 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tracker.services.imports import process_import_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run CSV imports staged by the /internal/import/ endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when no imports are waiting.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    ran = process_import_jobs()
+                except Exception:
+                    logger.exception("Import worker failed to process a job.")
+                    ran = 0
+                processed += ran
+                if ran:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        close_old_connections()
+        self.stdout.write(f"Processed {processed} import job(s).")
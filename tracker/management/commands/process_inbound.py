@@ -0,0 +1,76 @@
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from tracker.services.inbound import claim_and_process
+
+logger = logging.getLogger(__name__)
+
+
+def _work(shard: int, shards: int, batch_size: int, poll_interval: float, once: bool):
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    while not stopping:
+        close_old_connections()
+        try:
+            processed = claim_and_process(batch_size, shard=shard, shards=shards)
+        except Exception:
+            logger.exception("Inbound worker failed to process a batch.")
+            processed = 0
+        if processed:
+            continue
+        if once:
+            break
+        time.sleep(poll_interval)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued inbound messages with a pool of worker processes. Users are "
+        "sharded across workers so each user's messages run in order."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds to sleep when no messages are waiting.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        if options["workers"] <= 0 or options["batch_size"] <= 0:
+            raise CommandError("--workers and --batch-size must be positive.")
+        worker_args = (options["batch_size"], options["poll_interval"], options["once"])
+        workers = options["workers"]
+        if workers == 1:
+            _work(0, 1, *worker_args)
+            return
+
+        # Children must open their own database connections.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_work, args=(index, workers, *worker_args), name=f"inbound-{index}")
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+        self.stdout.write(f"Stopped {len(processes)} inbound worker(s).")
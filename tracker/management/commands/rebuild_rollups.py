@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.models import WhatsAppUser
+from tracker.services.rollups import rebuild_rollups
+from tracker.services.scheduler import serialized_for_user
+
+
+class Command(BaseCommand):
+    help = "Recompute spend rollups from raw expenses and repair any that have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("phone_numbers", nargs="*", help="Only rebuild these users (default: all users).")
+
+    def handle(self, *args, **options):
+        users = WhatsAppUser.objects.order_by("id")
+        if options["phone_numbers"]:
+            users = users.filter(phone_number__in=options["phone_numbers"])
+            if not users.exists():
+                raise CommandError("No matching users found.")
+        repaired_users = 0
+        for user in users.iterator():
+            # Under the user's lock no expense write can interleave with the
+            # recompute-and-replace.
+            with serialized_for_user(user):
+                drifted = rebuild_rollups(user)
+            if drifted:
+                repaired_users += 1
+                self.stdout.write(f"{user.phone_number}: repaired {drifted} rollup row(s).")
+        self.stdout.write(f"Rebuilt rollups; {repaired_users} user(s) had drifted.")
@@ -0,0 +1,57 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from tracker.services.outbound import process_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound WhatsApp messages with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        if options["workers"] <= 0 or options["batch_size"] <= 0:
+            raise CommandError("--workers and --batch-size must be positive.")
+        stop = threading.Event()
+        sent_counts = [0] * options["workers"]
+
+        def run(index: int):
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    processed = process_batch(options["batch_size"])
+                except Exception:
+                    logger.exception("Outbound worker %s failed to process a batch.", index)
+                    processed = 0
+                sent_counts[index] += processed
+                if processed:
+                    continue
+                if options["once"]:
+                    break
+                stop.wait(options["poll_interval"])
+            close_old_connections()
+
+        threads = [
+            threading.Thread(target=run, args=(index,), name=f"outbound-{index}", daemon=True)
+            for index in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(f"Processed {sum(sent_counts)} outbound message(s).")
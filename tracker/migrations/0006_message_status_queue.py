@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('received', 'Received'), ('processed', 'Processed'), ('rejected', 'Rejected'), ('failed', 'Failed')], default='received', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['status', 'id'], name='tracker_mes_status_bf25e2_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'id'], name='tracker_exp_user_id_5ccfab_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_expense_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['fingerprint', 'created_at'], name='tracker_exp_fingerp_836c4f_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:53
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def _fingerprint(expense) -> str:
+    # Frozen copy of services.expenses.expense_fingerprint as of this migration.
+    source = ""
+    if expense.source_card_id:
+        source = expense.source_card.issuer
+    elif expense.source_account_id:
+        source = expense.source_account.name
+    kind = "card" if expense.source_type == "card" else "account"
+    raw = ":".join(
+        [
+            str(expense.user_id),
+            f"{Decimal(expense.amount):.2f}",
+            (expense.category.name if expense.category_id else "").strip().lower(),
+            kind,
+            (source or "").strip().lower(),
+        ]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Expense = apps.get_model("tracker", "Expense")
+    queryset = Expense.objects.filter(fingerprint="").select_related("category", "source_account", "source_card")
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE])
+        if not batch:
+            break
+        for expense in batch:
+            expense.fingerprint = _fingerprint(expense)
+        Expense.objects.bulk_update(batch, ["fingerprint"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_expense_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
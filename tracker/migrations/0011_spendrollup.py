@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_backfill_expense_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=8)),
+                ('period_start', models.DateField()),
+                ('category_name', models.CharField(blank=True, max_length=64)),
+                ('currency', models.CharField(max_length=8)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.whatsappuser')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'period_start', 'category_name', 'currency'), name='tracker_spendrollup_key')],
+            },
+        ),
+    ]
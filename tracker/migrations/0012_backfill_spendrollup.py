@@ -0,0 +1,73 @@
+# Generated by Django 5.2.10 on 2026-10-18 02:56
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 2000
+
+
+def backfill_rollups(apps, schema_editor):
+    Expense = apps.get_model("tracker", "Expense")
+    SpendRollup = apps.get_model("tracker", "SpendRollup")
+    days = (
+        Expense.objects.values_list("user_id", "date", "category__name", "currency")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by("user_id")
+    )
+    pending = []
+    months = defaultdict(lambda: [Decimal("0.00"), 0])
+    current_user = None
+
+    def flush_months():
+        for (user_id, start, category_name, currency), (total, count) in months.items():
+            pending.append(
+                SpendRollup(
+                    user_id=user_id,
+                    period="month",
+                    period_start=start,
+                    category_name=category_name,
+                    currency=currency,
+                    total=total,
+                    expense_count=count,
+                )
+            )
+        months.clear()
+
+    for user_id, day, category_name, currency, total, count in days.iterator():
+        if user_id != current_user:
+            flush_months()
+            current_user = user_id
+        category_name = category_name or ""
+        pending.append(
+            SpendRollup(
+                user_id=user_id,
+                period="day",
+                period_start=day,
+                category_name=category_name,
+                currency=currency,
+                total=total,
+                expense_count=count,
+            )
+        )
+        month = months[(user_id, day.replace(day=1), category_name, currency)]
+        month[0] += total
+        month[1] += count
+        if len(pending) >= BATCH_SIZE:
+            SpendRollup.objects.bulk_create(pending)
+            pending.clear()
+    flush_months()
+    SpendRollup.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_spendrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_backfill_spendrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappuser',
+            name='reply_generation',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
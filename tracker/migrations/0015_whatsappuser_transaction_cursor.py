@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappuser',
+            name='transaction_cursor',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -7,6 +7,8 @@ class WhatsAppUser(models.Model):
     locale = models.CharField(max_length=16, default="en")
     timezone = models.CharField(max_length=64, default="UTC")
     default_currency = models.CharField(max_length=8, default="inr")
+    reply_generation = models.PositiveBigIntegerField(default=0)
+    transaction_cursor = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
@@ -83,6 +85,7 @@ class Expense(models.Model):
     )
     source_card = models.ForeignKey(Card, null=True, blank=True, on_delete=models.SET_NULL)
     note = models.TextField(blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -90,6 +93,8 @@ class Expense(models.Model):
         indexes = [
             models.Index(fields=["user", "date"]),
             models.Index(fields=["user", "category"]),
+            models.Index(fields=["user", "date", "id"]),
+            models.Index(fields=["fingerprint", "created_at"]),
         ]
 
     def __str__(self) -> str:
@@ -138,10 +143,12 @@ class Message(models.Model):
     STATUS_RECEIVED = "received"
     STATUS_PROCESSED = "processed"
     STATUS_REJECTED = "rejected"
+    STATUS_FAILED = "failed"
     STATUS_CHOICES = [
         (STATUS_RECEIVED, "Received"),
         (STATUS_PROCESSED, "Processed"),
         (STATUS_REJECTED, "Rejected"),
+        (STATUS_FAILED, "Failed"),
     ]
 
     user = models.ForeignKey(WhatsAppUser, on_delete=models.CASCADE)
@@ -154,9 +161,110 @@ class Message(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["idempotency_key"]),
+            models.Index(fields=["status", "id"]),
         ]
 
     def __str__(self) -> str:
         return f"{self.idempotency_key} ({self.status})"
 
+
+class OutboundMessage(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    to_number = models.CharField(max_length=32)
+    body = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    provider_sid = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["to_number", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.to_number} ({self.status})"
+
+
+class SpendRollup(models.Model):
+    PERIOD_DAY = "day"
+    PERIOD_MONTH = "month"
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, "Day"),
+        (PERIOD_MONTH, "Month"),
+    ]
+
+    user = models.ForeignKey(WhatsAppUser, on_delete=models.CASCADE)
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    category_name = models.CharField(max_length=64, blank=True)
+    currency = models.CharField(max_length=8)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "period", "period_start", "category_name", "currency"],
+                name="tracker_spendrollup_key",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.period_start} {self.category_name or 'uncategorized'}: {self.total}"
+
+
+class ImportJob(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(WhatsAppUser, on_delete=models.CASCADE)
+    path = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stats = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"import {self.pk} ({self.status})"
+
+
+class RateLimitBucket(models.Model):
+    key = models.CharField(max_length=96, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+
+    def __str__(self) -> str:
+        return f"{self.key} ({self.tokens:.2f})"
+
 # Create your models here.
@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+from django.db.models import F
+
 from ..models import Account
 from .currency import get_user_currency
 
@@ -30,9 +32,13 @@ def upsert_account(user, name: str, account_type: str, balance: Decimal | None =
     return account, created
 
 
-def adjust_balance(account: Account, delta: Decimal):
-    account.balance += delta
-    account.save(update_fields=["balance"])
+def adjust_balance(account: Account, delta: Decimal) -> Decimal:
+    # balance = balance + delta is applied in the database, so concurrent
+    # writers cannot lose each other's changes; only the new balance is read
+    # back.
+    Account.objects.filter(pk=account.pk).update(balance=F("balance") + delta)
+    account.balance = Account.objects.filter(pk=account.pk).values_list("balance", flat=True).get()
+    return account.balance
 
 
 def describe_account(account: Account) -> str:
@@ -0,0 +1,147 @@
+from calendar import monthrange
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from ..models import SpendRollup
+from .currency import get_user_currency
+from .reporting import shift_month
+
+MOVING_AVERAGE_MONTHS = 3
+GROWTH_MONTHS = 3
+_ZERO = Decimal("0.00")
+
+
+@dataclass(frozen=True)
+class Insights:
+    months: list[date]
+    monthly_totals: list[Decimal]
+    category_averages: list[tuple[str, Decimal, Decimal]]
+    month_to_date: Decimal
+    last_month_to_date: Decimal
+    days_elapsed: int
+    days_in_month: int
+
+    @property
+    def daily_velocity(self) -> Decimal:
+        return self.month_to_date / self.days_elapsed
+
+    @property
+    def projected_total(self) -> Decimal:
+        return self.daily_velocity * self.days_in_month
+
+
+def compute_insights(user, today: date | None = None) -> Insights:
+    # Two grouped queries over the rollups do all the summing in the
+    # database, so the cost depends on months x categories, not on how many
+    # expenses the user has. Averages and growth only make sense in one
+    # currency, so expenses in others are left out.
+    today = today or timezone.localdate()
+    currency = get_user_currency(user)
+    this_month = today.replace(day=1)
+    history = max(MOVING_AVERAGE_MONTHS, GROWTH_MONTHS + 1)
+    months = [shift_month(this_month, offset) for offset in range(-history, 1)]
+    by_category: dict[str, dict[date, Decimal]] = defaultdict(dict)
+    rows = (
+        SpendRollup.objects.filter(
+            user=user,
+            period=SpendRollup.PERIOD_MONTH,
+            currency=currency,
+            period_start__gte=months[0],
+            period_start__lte=this_month,
+        )
+        .values_list("period_start", "category_name")
+        .annotate(total=Sum("total"))
+        .order_by()
+    )
+    for period_start, name, total in rows:
+        by_category[name or "uncategorized"][period_start] = total
+
+    last_month = months[-2]
+    same_day_last_month = last_month.replace(day=min(today.day, monthrange(last_month.year, last_month.month)[1]))
+    pace = SpendRollup.objects.filter(
+        user=user,
+        period=SpendRollup.PERIOD_DAY,
+        currency=currency,
+        period_start__gte=last_month,
+        period_start__lte=today,
+    ).aggregate(
+        month_to_date=Sum("total", filter=Q(period_start__gte=this_month)),
+        last_month_to_date=Sum("total", filter=Q(period_start__lte=same_day_last_month)),
+    )
+
+    category_averages = []
+    for name, totals in by_category.items():
+        window = months[-1 - MOVING_AVERAGE_MONTHS : -1]
+        average = sum((totals.get(month, _ZERO) for month in window), _ZERO) / MOVING_AVERAGE_MONTHS
+        current = totals.get(this_month, _ZERO)
+        if average or current:
+            category_averages.append((name, average, current))
+    category_averages.sort(key=lambda item: (-item[1], item[0]))
+    return Insights(
+        months=months,
+        monthly_totals=[sum((totals.get(month, _ZERO) for totals in by_category.values()), _ZERO) for month in months],
+        category_averages=category_averages,
+        month_to_date=pace["month_to_date"] or _ZERO,
+        last_month_to_date=pace["last_month_to_date"] or _ZERO,
+        days_elapsed=today.day,
+        days_in_month=monthrange(today.year, today.month)[1],
+    )
+
+
+def _percent(previous: Decimal, change: Decimal) -> str:
+    if not previous:
+        return "n/a"
+    return f"{change / previous:+.0%}"
+
+
+def _averages_lines(insights: Insights, currency: str) -> list[str]:
+    lines = [f"{MOVING_AVERAGE_MONTHS}-month moving average by category:"]
+    lines.extend(
+        f"- {name}: {average:.2f} {currency}/month, {current:.2f} so far this month"
+        for name, average, current in insights.category_averages
+    )
+    if not insights.category_averages:
+        lines.append("- No expenses in the last few months.")
+    return lines
+
+
+def _growth_lines(insights: Insights, currency: str) -> list[str]:
+    lines = ["Month-over-month growth:"]
+    totals = insights.monthly_totals
+    # The current month is partial, so growth compares completed months only.
+    for offset in range(len(totals) - 1 - GROWTH_MONTHS, len(totals) - 1):
+        previous, total = totals[offset - 1], totals[offset]
+        lines.append(
+            f"- {insights.months[offset]:%b %Y}: {total:.2f} {currency} ({_percent(previous, total - previous)})"
+        )
+    return lines
+
+
+def _pace_lines(insights: Insights, currency: str) -> list[str]:
+    change = insights.month_to_date - insights.last_month_to_date
+    return [
+        f"This month so far: {insights.month_to_date:.2f} {currency} over {insights.days_elapsed} day(s)",
+        f"Spend velocity: {insights.daily_velocity:.2f} {currency}/day",
+        f"Same point last month: {insights.last_month_to_date:.2f} {currency} "
+        f"({_percent(insights.last_month_to_date, change)})",
+        f"Projected month-end total: {insights.projected_total:.2f} {currency}",
+    ]
+
+
+_SECTIONS = {
+    "averages": _averages_lines,
+    "growth": _growth_lines,
+    "pace": _pace_lines,
+}
+
+
+def spending_insights(user, metric: str | None = None) -> str:
+    insights = compute_insights(user)
+    currency = get_user_currency(user).upper()
+    sections = [_SECTIONS[metric]] if metric else list(_SECTIONS.values())
+    return "\n\n".join("\n".join(section(insights, currency)) for section in sections)
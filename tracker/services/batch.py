@@ -0,0 +1,37 @@
+from django.db import transaction
+
+from .errors import IntentRoutingError, ValidationError
+from .expenses import SourceLookups
+from .handlers import handle_intent
+from .intent_router import route_intent
+from .scheduler import serialized_for_user
+from .validation import validate_payload
+
+BATCH_INTENT = "MULTI_COMMAND"
+MAX_BATCH_LINES = 20
+
+
+def split_commands(text: str) -> list[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def handle_batch(user, lines: list[str]) -> str:
+    if len(lines) > MAX_BATCH_LINES:
+        raise ValidationError(f"Please send at most {MAX_BATCH_LINES} lines per message.")
+    lookups = SourceLookups(user)
+    results = []
+    # One transaction for the whole message; each line runs in a savepoint so
+    # a rejected line is reported without undoing the others.
+    with serialized_for_user(user):
+        for number, line in enumerate(lines, start=1):
+            try:
+                intent, command = route_intent(line)
+                with transaction.atomic():
+                    validate_payload(intent, command, user)
+                    reply = handle_intent(user, intent, command, lookups)
+            except (IntentRoutingError, ValidationError) as exc:
+                # Rows created inside the rolled-back savepoint are gone.
+                lookups.clear()
+                reply = f"Error: {exc}"
+            results.append(f"{number}. {reply}")
+    return "\n".join(results)
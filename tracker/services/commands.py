@@ -0,0 +1,326 @@
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.utils import timezone
+
+
+def _parse_int(value: str | None) -> int | None:
+    if not value:
+        return None
+    return int(value)
+
+
+def _parse_date(value: str | None) -> datetime.date | None:
+    if not value:
+        return None
+    if "-" in value:
+        return timezone.datetime.strptime(value, "%Y-%m-%d").date()
+    return timezone.datetime.strptime(value, "%d/%m/%Y").date()
+
+
+def _strip(value: str | None) -> str | None:
+    if not value:
+        return value
+    return value.strip()
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseCreate:
+    amount: Decimal
+    category: str
+    source: str
+    source_type: str | None
+    currency: str | None = None
+    card_last4: str | None = None
+    date: datetime.date | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            amount=Decimal(groups["amount"]),
+            category=groups["category"],
+            source=groups["source"],
+            source_type=groups.get("source_type"),
+            currency=groups.get("currency"),
+            card_last4=_strip(groups.get("card_last4")),
+            date=_parse_date(groups.get("date")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseUpdate:
+    expense_id: int
+    amount: Decimal
+    currency: str | None = None
+    category: str | None = None
+    source: str | None = None
+    source_type: str | None = None
+    card_last4: str | None = None
+    date: datetime.date | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            expense_id=int(groups["expense_id"]),
+            amount=Decimal(groups["amount"]),
+            currency=groups.get("currency"),
+            category=groups.get("category"),
+            source=groups.get("source"),
+            source_type=groups.get("source_type"),
+            card_last4=_strip(groups.get("card_last4")),
+            date=_parse_date(groups.get("date")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseDelete:
+    expense_id: int
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(expense_id=int(groups["expense_id"]))
+
+
+@dataclass(frozen=True, slots=True)
+class BalanceQuery:
+    source: str
+    source_type: str
+    card_last4: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            source=groups["source"],
+            source_type=groups["source_type"],
+            card_last4=_strip(groups.get("card_last4")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SummaryQuery:
+    month: str | None = None
+    year: int | None = None
+    relative_period: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            month=groups.get("month"),
+            year=_parse_int(groups.get("year")),
+            relative_period=groups.get("relative_period"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CategorySummary:
+    month: str | None = None
+    year: int | None = None
+    relative_period: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            month=groups.get("month"),
+            year=_parse_int(groups.get("year")),
+            relative_period=groups.get("relative_period"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class MonthComparison:
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+@dataclass(frozen=True, slots=True)
+class SpendTrend:
+    months: int = 12
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+_INSIGHT_METRICS = {
+    "insights": None,
+    "moving averages": "averages",
+    "averages": "averages",
+    "growth": "growth",
+    "velocity": "pace",
+    "forecast": "pace",
+    "projection": "pace",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class InsightsQuery:
+    metric: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(metric=_INSIGHT_METRICS[groups["metric"]])
+
+
+@dataclass(frozen=True, slots=True)
+class LedgerExport:
+    format: str = "csv"
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(format=groups.get("format") or "csv")
+
+
+@dataclass(frozen=True, slots=True)
+class CreditCardQuery:
+    metric: str
+    source: str
+    card_last4: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            metric=groups["metric"],
+            source=groups["source"],
+            card_last4=_strip(groups.get("card_last4")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class AccountList:
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+@dataclass(frozen=True, slots=True)
+class CardList:
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+@dataclass(frozen=True, slots=True)
+class TransactionList:
+    more: bool = False
+    before_id: int | None = None
+    category: str | None = None
+    source: str | None = None
+    source_type: str | None = None
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            more=bool(groups.get("more")),
+            before_id=_parse_int(groups.get("before_id")),
+            category=groups.get("category"),
+            source=groups.get("source"),
+            source_type=groups.get("source_type"),
+            date_from=_parse_date(groups.get("date_from")),
+            date_to=_parse_date(groups.get("date_to")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryList:
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+@dataclass(frozen=True, slots=True)
+class LoanList:
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls()
+
+
+@dataclass(frozen=True, slots=True)
+class LoanUpsert:
+    loan_name: str
+    amount: Decimal
+    currency: str | None = None
+    description: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            loan_name=groups["loan_name"],
+            amount=Decimal(groups["amount"]),
+            currency=groups.get("currency"),
+            description=groups.get("description"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class LoanPayment:
+    loan_name: str
+    amount: Decimal
+    currency: str | None = None
+    date: datetime.date | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            loan_name=groups["loan_name"],
+            amount=Decimal(groups["amount"]),
+            currency=groups.get("currency"),
+            date=_parse_date(groups.get("date")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class AccountUpsert:
+    source: str
+    source_type: str
+    balance: Decimal
+    currency: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            source=groups["source"],
+            source_type=groups["source_type"],
+            balance=Decimal(groups["balance"]),
+            currency=groups.get("currency"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CardUpsert:
+    source: str
+    credit_limit: Decimal
+    currency: str | None = None
+    billing_cycle_day: int | None = None
+    last4: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(
+            source=groups["source"],
+            credit_limit=Decimal(groups["credit_limit"]),
+            currency=groups.get("currency"),
+            billing_cycle_day=_parse_int(groups.get("billing_cycle_day")),
+            last4=groups.get("last4"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Help:
+    help_topic: str | None = None
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(help_topic=groups.get("help_topic"))
+
+
+@dataclass(frozen=True, slots=True)
+class CurrencySet:
+    currency: str
+
+    @classmethod
+    def from_groups(cls, groups: dict):
+        return cls(currency=groups["currency"])
@@ -1,9 +1,17 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from ..models import Category, Expense
+from ..models import Account, Card, Category, Expense, WhatsAppUser
 from .accounts import adjust_balance, get_or_create_account
-from .cards import get_or_create_card
+from .cards import get_or_create_card, get_outstanding
 from .currency import get_user_currency, normalize_currency_code
+from .rollups import RollupDelta, record_expense
 
 
 def _get_or_create_category(user, name: str | None) -> Category | None:
@@ -13,94 +21,300 @@ def _get_or_create_category(user, name: str | None) -> Category | None:
     return category
 
 
-def create_expense(user, data: dict) -> Expense:
-    category = _get_or_create_category(user, data.get("category"))
-    source_type = data.get("source_type")
-    source_account = None
-    source_card = None
+TRANSACTION_PAGE_SIZE = 10
 
-    if source_type in {"account", "cash"}:
-        source_account = get_or_create_account(user, data["source"], source_type)
-    elif source_type == "card":
-        source_card = get_or_create_card(user, data["source"], data.get("card_last4"))
 
-    currency_code = normalize_currency_code(
-        data.get("currency") or get_user_currency(user)
+def expense_fingerprint(
+    user_id: int,
+    amount: Decimal,
+    category: str | None,
+    source_type: str | None,
+    source: str | None,
+) -> str:
+    # Account and cash sources share a kind, as they share a name space for
+    # duplicate detection.
+    kind = "card" if source_type == "card" else "account"
+    raw = ":".join(
+        [
+            str(user_id),
+            f"{Decimal(amount):.2f}",
+            (category or "").strip().lower(),
+            kind,
+            (source or "").strip().lower(),
+        ]
     )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 
-    expense = Expense.objects.create(
-        user=user,
-        amount=data["amount"],
-        currency=currency_code,
-        date=data.get("date") or timezone.localdate(),
-        category=category,
-        source_type=source_type,
-        source_account=source_account,
-        source_card=source_card,
+def fingerprint_for(expense: Expense) -> str:
+    source = None
+    if expense.source_card:
+        source = expense.source_card.issuer
+    elif expense.source_account:
+        source = expense.source_account.name
+    return expense_fingerprint(
+        expense.user_id,
+        expense.amount,
+        expense.category.name if expense.category else None,
+        expense.source_type,
+        source,
     )
 
-    if source_account:
-        adjust_balance(source_account, -expense.amount)
-    return expense
 
+class SourceLookups:
+    # Resolves each distinct category, account and card once for a run of
+    # writes by the same user (a multi-line message or a CSV import).
+    def __init__(self, user):
+        self.user = user
+        self.categories: dict[str, Category] = {}
+        self.accounts: dict[tuple[str, str], Account] = {}
+        self.cards: dict[tuple[str, str], Card] = {}
 
-def update_expense(user, data: dict) -> Expense | None:
-    expense = Expense.objects.filter(user=user, id=data["expense_id"]).first()
-    if not expense:
-        return None
+    def preload(self):
+        self.categories = {category.name: category for category in Category.objects.filter(user=self.user)}
+        self.accounts = {
+            (account.name, account.type): account for account in Account.objects.filter(user=self.user)
+        }
 
-    original_account = expense.source_account
-    original_card = expense.source_card
-    original_amount = expense.amount
-
-    if data.get("amount") is not None:
-        expense.amount = data["amount"]
-    if data.get("currency"):
-        expense.currency = normalize_currency_code(data["currency"])
-    if data.get("date"):
-        expense.date = data["date"]
-    if data.get("category"):
-        expense.category = _get_or_create_category(user, data["category"])
-
-    if data.get("source") and data.get("source_type"):
-        if data["source_type"] in {"account", "cash"}:
-            expense.source_account = get_or_create_account(
-                user, data["source"], data["source_type"]
-            )
-            expense.source_card = None
+    def clear(self):
+        self.categories.clear()
+        self.accounts.clear()
+        self.cards.clear()
+
+    def category(self, name: str | None) -> Category | None:
+        if not name:
+            return None
+        category = self.categories.get(name.strip())
+        if category is None:
+            category = _get_or_create_category(self.user, name)
+            self.categories[category.name] = category
+        return category
+
+    def account(self, name: str, account_type: str) -> Account:
+        key = (name.strip(), account_type)
+        account = self.accounts.get(key)
+        if account is None:
+            account = get_or_create_account(self.user, name, account_type)
+            self.accounts[key] = account
+        return account
+
+    def card(self, issuer: str, last4: str | None) -> Card:
+        key = (issuer.strip().lower(), (last4 or "").strip())
+        card = self.cards.get(key)
+        if card is None:
+            card = get_or_create_card(self.user, issuer, last4)
+            self.cards[key] = card
+        return card
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseWrite:
+    expense: Expense
+    balance: Decimal | None = None
+    outstanding: Decimal | None = None
+
+
+def _write_result(expense: Expense, balance: Decimal | None) -> ExpenseWrite:
+    outstanding = None
+    if expense.source_card:
+        outstanding = get_outstanding(expense.source_card)
+    return ExpenseWrite(expense=expense, balance=balance, outstanding=outstanding)
+
+
+def create_expense(user, command, lookups: SourceLookups | None = None) -> ExpenseWrite:
+    lookups = lookups or SourceLookups(user)
+    with transaction.atomic():
+        category = lookups.category(command.category)
+        source_type = command.source_type
+        source_account = None
+        source_card = None
+
+        if source_type in {"account", "cash"}:
+            source_account = lookups.account(command.source, source_type)
+        elif source_type == "card":
+            source_card = lookups.card(command.source, command.card_last4)
+
+        currency_code = normalize_currency_code(
+            command.currency or get_user_currency(user)
+        )
+
+        expense = Expense(
+            user=user,
+            amount=command.amount,
+            currency=currency_code,
+            date=command.date or timezone.localdate(),
+            category=category,
+            source_type=source_type,
+            source_account=source_account,
+            source_card=source_card,
+        )
+        expense.fingerprint = fingerprint_for(expense)
+        expense.save(force_insert=True)
+        record_expense(expense)
+
+        balance = None
+        if source_account:
+            balance = adjust_balance(source_account, -expense.amount)
+        return _write_result(expense, balance)
+
+
+def _get_expense(user, expense_id: int) -> Expense | None:
+    return (
+        Expense.objects.select_related("user", "category", "source_account", "source_card")
+        .filter(user=user, id=expense_id)
+        .first()
+    )
+
+
+def update_expense(user, command) -> ExpenseWrite | None:
+    with transaction.atomic():
+        expense = _get_expense(user, command.expense_id)
+        if not expense:
+            return None
+
+        original_account = expense.source_account
+        original_amount = expense.amount
+        rollups = RollupDelta()
+        rollups.add(expense, -1)
+
+        if command.amount is not None:
+            expense.amount = command.amount
+        if command.currency:
+            expense.currency = normalize_currency_code(command.currency)
+        if command.date:
+            expense.date = command.date
+        if command.category:
+            expense.category = _get_or_create_category(user, command.category)
+
+        if command.source and command.source_type:
+            if command.source_type in {"account", "cash"}:
+                expense.source_account = get_or_create_account(
+                    user, command.source, command.source_type
+                )
+                expense.source_card = None
+            else:
+                expense.source_card = get_or_create_card(
+                    user, command.source, command.card_last4
+                )
+                expense.source_account = None
+            expense.source_type = command.source_type
+
+        expense.fingerprint = fingerprint_for(expense)
+        expense.save()
+        rollups.add(expense)
+        rollups.apply()
+
+        balance = None
+        account = expense.source_account
+        if original_account and account and original_account.pk == account.pk:
+            # Same account: restore and re-apply as one update.
+            balance = adjust_balance(account, original_amount - expense.amount)
         else:
-            expense.source_card = get_or_create_card(
-                user, data["source"], data.get("card_last4")
-            )
-            expense.source_account = None
-        expense.source_type = data["source_type"]
+            if original_account:
+                adjust_balance(original_account, original_amount)
+            if account:
+                balance = adjust_balance(account, -expense.amount)
+        return _write_result(expense, balance)
 
-    expense.save()
 
-    if original_account or expense.source_account:
-        if original_account:
-            adjust_balance(original_account, original_amount)
+def delete_expense(user, expense_id: int) -> ExpenseWrite | None:
+    with transaction.atomic():
+        expense = _get_expense(user, expense_id)
+        if not expense:
+            return None
+        balance = None
         if expense.source_account:
-            adjust_balance(expense.source_account, -expense.amount)
+            balance = adjust_balance(expense.source_account, expense.amount)
+        Expense.objects.filter(pk=expense.pk).delete()
+        record_expense(expense, -1)
+        return ExpenseWrite(expense=expense, balance=balance)
 
-    return expense
 
+_CURSOR_FILTERS = ("category", "source", "source_type", "date_from", "date_to")
+_CURSOR_DATES = ("date_from", "date_to")
 
-def delete_expense(user, expense_id: int):
-    expense = Expense.objects.filter(user=user, id=expense_id).first()
-    if not expense:
-        return False, None
-    restored_account = expense.source_account
-    if restored_account:
-        adjust_balance(restored_account, expense.amount)
-    expense.delete()
-    return True, restored_account
 
+def _save_cursor(user, last_id: int | None, filters: dict):
+    # The next page's cursor is kept on the user row rather than in a
+    # per-process cache, so a bare "more transactions" works whichever worker
+    # receives it.
+    cursor = {}
+    if last_id is not None:
+        cursor = {name: value for name, value in filters.items() if value}
+        for name in _CURSOR_DATES:
+            if name in cursor:
+                cursor[name] = cursor[name].isoformat()
+        cursor["before_id"] = last_id
+    WhatsAppUser.objects.filter(pk=user.pk).update(transaction_cursor=cursor)
 
-def list_expenses(user, limit: int = 10) -> str:
-    expenses = Expense.objects.filter(user=user).order_by("-date", "-id")[:limit]
+
+def _saved_cursor(user) -> tuple[int, dict] | None:
+    cursor = WhatsAppUser.objects.filter(pk=user.pk).values_list("transaction_cursor", flat=True).first()
+    if not cursor:
+        return None
+    filters = {name: cursor.get(name) for name in _CURSOR_FILTERS}
+    for name in _CURSOR_DATES:
+        if filters[name]:
+            filters[name] = date.fromisoformat(filters[name])
+    return cursor["before_id"], filters
+
+
+def _filtered_expenses(user, filters: dict):
+    queryset = Expense.objects.filter(user=user)
+    if filters.get("category"):
+        queryset = queryset.filter(category__name__iexact=filters["category"])
+    if filters.get("source_type") == "card":
+        queryset = queryset.filter(source_card__issuer__iexact=filters["source"])
+    elif filters.get("source_type"):
+        queryset = queryset.filter(
+            source_type=filters["source_type"],
+            source_account__name__iexact=filters["source"],
+        )
+    if filters.get("date_from"):
+        queryset = queryset.filter(date__gte=filters["date_from"])
+    if filters.get("date_to"):
+        queryset = queryset.filter(date__lte=filters["date_to"])
+    return queryset
+
+
+def list_expenses(user, command=None, limit: int = TRANSACTION_PAGE_SIZE) -> str:
+    filters = {}
+    before_id = None
+    cursor = None
+    if command is not None:
+        filters = {name: getattr(command, name) for name in _CURSOR_FILTERS}
+        before_id = command.before_id
+        if command.more and not before_id:
+            # A bare "more" continues the last listing with its filters.
+            saved = _saved_cursor(user)
+            if saved is None:
+                return "No more transactions. Send 'list transactions' to start again."
+            before_id, filters = saved
+        if before_id:
+            cursor = (
+                Expense.objects.filter(user=user, id=before_id)
+                .values_list("date", "id")
+                .first()
+            )
+            if cursor is None:
+                return "Expense not found."
+
+    queryset = _filtered_expenses(user, filters)
+    if cursor:
+        # Keyset pagination on (date, id) walks the (user, date, id) index, so
+        # every page costs the same however far back it is.
+        cursor_date, cursor_id = cursor
+        queryset = queryset.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id))
+    expenses = list(
+        queryset.select_related("category", "source_account", "source_card").order_by("-date", "-id")[
+            : limit + 1
+        ]
+    )
+    has_more = len(expenses) > limit
+    expenses = expenses[:limit]
+    _save_cursor(user, expenses[-1].id if has_more else None, filters)
     if not expenses:
-        return "No transactions found."
+        return "No more transactions." if cursor else "No transactions found."
     lines = []
     for expense in expenses:
         category = expense.category.name if expense.category else "uncategorized"
@@ -110,6 +324,11 @@ def list_expenses(user, limit: int = 10) -> str:
         elif expense.source_type == "card" and expense.source_card:
             source = f"{expense.source_card.issuer} card"
         lines.append(
-            f"- {expense.amount:.2f} {expense.currency.upper()} on {category} from {source} on {expense.date}"
+            f"- #{expense.id} {expense.amount:.2f} {expense.currency.upper()} on {category} "
+            f"from {source} on {expense.date}"
         )
-    return "Recent transactions:\n" + "\n".join(lines)
+    heading = "Earlier transactions:" if cursor else "Recent transactions:"
+    reply = heading + "\n" + "\n".join(lines)
+    if has_more:
+        reply += "\nSend 'more transactions' for older entries."
+    return reply
@@ -0,0 +1,158 @@
+import csv
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from ..models import Account, Expense, LoanPayment, WhatsAppUser
+from .currency import get_user_currency
+
+EXPORT_FORMATS = ("csv", "json")
+EXPORT_COLUMNS = ("record", "id", "date", "amount", "currency", "category", "source_type", "source", "card_last4", "note")
+_SIGNING_SALT = "tracker.export"
+_ROWS_PER_ASYNC_CHUNK = 500
+
+
+def ledger_records(user, chunk_size: int | None = None) -> Iterator[dict]:
+    # values_list() plus iterator(chunk_size) streams rows from a server-side
+    # cursor without building model instances, so memory stays flat. Expense
+    # rows keep the import columns, so they can be fed back to import_expenses.
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    currency = get_user_currency(user)
+    accounts = (
+        Account.objects.filter(user=user)
+        .order_by("id")
+        .values_list("id", "created_at", "balance", "type", "name")
+    )
+    for account_id, created_at, balance, account_type, name in accounts.iterator(chunk_size=chunk_size):
+        yield {
+            "record": "account",
+            "id": account_id,
+            "date": created_at.date().isoformat(),
+            "amount": str(balance),
+            "currency": currency,
+            "category": "",
+            "source_type": account_type,
+            "source": name,
+            "card_last4": "",
+            "note": "",
+        }
+
+    expenses = (
+        Expense.objects.filter(user=user)
+        .order_by("date", "id")
+        .values_list(
+            "id",
+            "date",
+            "amount",
+            "currency",
+            "category__name",
+            "source_type",
+            "source_account__name",
+            "source_card__issuer",
+            "source_card__last4",
+            "note",
+        )
+    )
+    for row in expenses.iterator(chunk_size=chunk_size):
+        expense_id, date, amount, expense_currency, category, source_type, account, issuer, last4, note = row
+        yield {
+            "record": "expense",
+            "id": expense_id,
+            "date": date.isoformat(),
+            "amount": str(amount),
+            "currency": expense_currency,
+            "category": category or "",
+            "source_type": source_type,
+            "source": account or issuer or "",
+            "card_last4": last4 or "",
+            "note": note,
+        }
+
+    payments = (
+        LoanPayment.objects.filter(loan__user=user)
+        .order_by("paid_at", "id")
+        .values_list("id", "paid_at", "amount", "loan__name", "note")
+    )
+    for payment_id, paid_at, amount, loan_name, note in payments.iterator(chunk_size=chunk_size):
+        yield {
+            "record": "loan_payment",
+            "id": payment_id,
+            "date": paid_at.isoformat(),
+            "amount": str(amount),
+            "currency": currency,
+            "category": "",
+            "source_type": "loan",
+            "source": loan_name,
+            "card_last4": "",
+            "note": note,
+        }
+
+
+class _Line:
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(records: Iterator[dict]) -> Iterator[str]:
+    writer = csv.DictWriter(_Line(), fieldnames=EXPORT_COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def stream_json(records: Iterator[dict]) -> Iterator[str]:
+    yield "["
+    separator = "\n"
+    for record in records:
+        yield separator + json.dumps(record)
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def stream_ledger(user, export_format: str, chunk_size: int | None = None) -> Iterator[str]:
+    records = ledger_records(user, chunk_size)
+    if export_format == "json":
+        return stream_json(records)
+    return stream_csv(records)
+
+
+async def astream_ledger(user, export_format: str, chunk_size: int | None = None) -> AsyncIterator[str]:
+    # Under ASGI a sync iterator is read into memory in one go, so rows are
+    # pulled in blocks on the thread that owns the database cursor instead.
+    rows = stream_ledger(user, export_format, chunk_size)
+    next_block = sync_to_async(lambda: "".join(islice(rows, _ROWS_PER_ASYNC_CHUNK)), thread_sensitive=True)
+    while block := await next_block():
+        yield block
+
+
+def export_token(user, export_format: str) -> str:
+    return signing.dumps({"user": user.pk, "format": export_format}, salt=_SIGNING_SALT)
+
+
+def user_for_token(token: str) -> tuple[WhatsAppUser, str] | None:
+    try:
+        payload = signing.loads(token, salt=_SIGNING_SALT, max_age=settings.EXPORT_LINK_MAX_AGE_SECONDS)
+    except signing.BadSignature:
+        return None
+    user = WhatsAppUser.objects.filter(pk=payload.get("user")).first()
+    if user is None or payload.get("format") not in EXPORT_FORMATS:
+        return None
+    return user, payload["format"]
+
+
+def export_link(user, export_format: str) -> str:
+    # Replies have no request to derive a host from (queued messages are
+    # handled by workers), so links need an explicit public base URL.
+    if not settings.PUBLIC_BASE_URL:
+        return "Ledger export is not available: no public URL is configured for download links."
+    path = reverse("ledger-export", args=[export_token(user, export_format)])
+    hours = settings.EXPORT_LINK_MAX_AGE_SECONDS // 3600
+    return (
+        f"Your {export_format.upper()} ledger export is ready (link valid for {hours} hours): "
+        f"{settings.PUBLIC_BASE_URL.rstrip('/')}{path}"
+    )
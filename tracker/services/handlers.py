@@ -1,5 +1,7 @@
+from django.db import transaction
 from django.utils import timezone
 
+from .analytics import spending_insights
 from .cards import get_credit_summary, list_cards, upsert_card
 from .accounts import (
     describe_account,
@@ -8,49 +10,80 @@ from .accounts import (
     upsert_account,
 )
 from .categories import list_categories as list_categories_summary
+from .exports import export_link
 from .expenses import create_expense, delete_expense, list_expenses, update_expense
 from .loans import list_loans as list_loans_summary, pay_loan, upsert_loan
 from .help import get_help_text
+from .intent_router import WRITE_INTENTS
 from .notifications import expense_created, expense_deleted, expense_updated
-from .reporting import summarize_month, summarize_relative
+from .reporting import (
+    compare_months,
+    spending_trend,
+    summarize_by_category,
+    summarize_month,
+    summarize_relative,
+)
 from .currency import get_user_currency
+from .response_cache import CACHEABLE_INTENTS, cached_reply, invalidate_user_responses
 from .user_settings import set_default_currency
 
 
-def handle_intent(user, intent: str, data: dict) -> str:
+def handle_intent(user, intent: str, command, lookups=None) -> str:
+    if intent in CACHEABLE_INTENTS:
+        return cached_reply(user, intent, command, lambda: _dispatch(user, intent, command, lookups))
+    if intent not in WRITE_INTENTS:
+        return _dispatch(user, intent, command, lookups)
+    with transaction.atomic(savepoint=False):
+        reply = _dispatch(user, intent, command, lookups)
+        invalidate_user_responses(user)
+    return reply
+
+
+def _dispatch(user, intent: str, command, lookups=None) -> str:
     if intent == "EXPENSE_CREATE":
-        expense = create_expense(user, data)
-        return expense_created(expense)
+        return expense_created(create_expense(user, command, lookups))
     if intent == "EXPENSE_UPDATE":
-        expense = update_expense(user, data)
-        if not expense:
+        result = update_expense(user, command)
+        if not result:
             return "Expense not found."
-        return expense_updated(expense)
+        return expense_updated(result)
     if intent == "EXPENSE_DELETE":
-        deleted, restored_account = delete_expense(user, data["expense_id"])
-        if not deleted:
+        result = delete_expense(user, command.expense_id)
+        if not result:
             return "Expense not found."
-        return expense_deleted(data["expense_id"], restored_account)
+        return expense_deleted(command.expense_id, result)
     if intent == "BALANCE_QUERY":
-        if data.get("source_type") == "card":
+        if command.source_type == "card":
             return get_credit_summary(
-                user, data["source"], "outstanding", data.get("card_last4")
+                user, command.source, "outstanding", command.card_last4
             )
-        return get_balance_summary(user, data["source"], data["source_type"])
+        return get_balance_summary(user, command.source, command.source_type)
     if intent == "SUMMARY_QUERY":
-        if data.get("relative_period"):
-            return summarize_relative(user, data["relative_period"])
-        return summarize_month(user, data["month"], data.get("year"))
+        if command.relative_period:
+            return summarize_relative(user, command.relative_period)
+        return summarize_month(user, command.month, command.year)
+    if intent == "CATEGORY_SUMMARY":
+        return summarize_by_category(
+            user, command.month, command.year, command.relative_period
+        )
+    if intent == "MONTH_COMPARISON":
+        return compare_months(user)
+    if intent == "SPEND_TREND":
+        return spending_trend(user, command.months)
+    if intent == "INSIGHTS_QUERY":
+        return spending_insights(user, command.metric)
+    if intent == "LEDGER_EXPORT":
+        return export_link(user, command.format)
     if intent == "CREDIT_CARD_QUERY":
         return get_credit_summary(
-            user, data["source"], data["metric"], data.get("card_last4")
+            user, command.source, command.metric, command.card_last4
         )
     if intent == "ACCOUNT_LIST":
         return list_accounts(user)
     if intent == "CARD_LIST":
         return list_cards(user)
     if intent == "TRANSACTION_LIST":
-        return list_expenses(user)
+        return list_expenses(user, command)
     if intent == "CATEGORY_LIST":
         return list_categories_summary(user)
     if intent == "LOAN_LIST":
@@ -58,19 +91,19 @@ def handle_intent(user, intent: str, data: dict) -> str:
     if intent == "ACCOUNT_UPSERT":
         account, created = upsert_account(
             user,
-            data["source"],
-            data["source_type"],
-            balance=data.get("balance"),
+            command.source,
+            command.source_type,
+            balance=command.balance,
         )
         action = "Created" if created else "Updated"
         return f"{action} {describe_account(account)}"
     if intent == "CARD_UPSERT":
         card, created = upsert_card(
             user,
-            data["source"],
-            credit_limit=data.get("credit_limit"),
-            billing_cycle_day=data.get("billing_cycle_day"),
-            last4=data.get("last4"),
+            command.source,
+            credit_limit=command.credit_limit,
+            billing_cycle_day=command.billing_cycle_day,
+            last4=command.last4,
         )
         action = "Created" if created else "Updated"
         suffix = f" {card.last4}" if card.last4 else ""
@@ -82,9 +115,9 @@ def handle_intent(user, intent: str, data: dict) -> str:
     if intent == "LOAN_UPSERT":
         loan, created = upsert_loan(
             user,
-            data["loan_name"],
-            data["amount"],
-            description=data.get("description"),
+            command.loan_name,
+            command.amount,
+            description=command.description,
         )
         action = "Created" if created else "Updated"
         currency = get_user_currency(user).upper()
@@ -93,15 +126,15 @@ def handle_intent(user, intent: str, data: dict) -> str:
             f"{currency} on principal {loan.principal_amount:.2f} {currency}."
         )
     if intent == "LOAN_PAYMENT":
-        paid_on = data.get("date") or timezone.localdate()
-        loan, message = pay_loan(user, data["loan_name"], data["amount"], paid_on)
+        paid_on = command.date or timezone.localdate()
+        loan, message = pay_loan(user, command.loan_name, command.amount, paid_on)
         if loan is None:
             return message
         return message
     if intent == "HELP":
-        return get_help_text(data.get("help_topic"))
+        return get_help_text(command.help_topic)
     if intent == "CURRENCY_SET":
-        new_currency, changed = set_default_currency(user, data["currency"])
+        new_currency, changed = set_default_currency(user, command.currency)
         formatted = new_currency.upper()
         if changed:
             return f"Default currency updated to {formatted}."
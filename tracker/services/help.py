@@ -21,6 +21,7 @@ _GENERAL_HELP = [
     "- list loans",
     "- list transactions",
     "- set currency usd",
+    "- export ledger as csv",
 ]
 
 _TOPICAL_HELP = {
@@ -48,7 +49,13 @@ _TOPICAL_HELP = {
         "- update expense 23 amount 2500 category rent source hdfc card on 2024-09-01",
         "- delete expense 23",
         "- list transactions",
+        "- more transactions",
+        "- transactions before 42",
+        "- show transactions category groceries from hdfc card",
+        "- list transactions between 2024-09-01 and 2024-09-30",
         "- show expenses for september 2024",
+        "- export ledger as csv",
+        "- export ledger as json",
     ],
     "categories": [
         "Categories help:",
@@ -69,6 +76,14 @@ _TOPICAL_HELP = {
         "- summary expenses last month",
         "- show expenses for september 2024",
         "- show expenses for december 2024",
+        "- summary by category for september 2024",
+        "- summary by category last month",
+        "- compare this month vs last month",
+        "- show spending trend",
+        "- show spending insights",
+        "- spending moving averages",
+        "- spending growth",
+        "- spending forecast",
     ],
     "settings": [
         "Settings help:",
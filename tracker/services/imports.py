@@ -0,0 +1,219 @@
+import csv
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Account, Expense, ImportJob
+from .accounts import adjust_balance
+from .commands import ExpenseCreate
+from .currency import get_user_currency, normalize_currency_code
+from .errors import ValidationError
+from .expenses import SourceLookups, fingerprint_for
+from .response_cache import invalidate_user_responses
+from .rollups import RollupDelta
+from .scheduler import serialized_for_user
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = ("date", "amount", "category", "source", "source_type", "card_last4", "currency", "note")
+REQUIRED_COLUMNS = {"date", "amount", "category", "source", "source_type"}
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    errors: list[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
+
+    def skip(self, line: int, reason: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line}: {reason}")
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def check_columns(fieldnames):
+    missing = REQUIRED_COLUMNS - set(fieldnames or ())
+    if missing:
+        raise ValidationError(f"CSV is missing columns: {', '.join(sorted(missing))}.")
+
+
+def _parse_row(row: dict) -> ExpenseCreate:
+    groups = {name: (row.get(name) or "").strip() or None for name in IMPORT_COLUMNS}
+    for name in ("amount", "category", "source", "source_type"):
+        if not groups[name]:
+            raise ValidationError(f"Missing {name}.")
+    if groups["source_type"] not in {"account", "cash", "card"}:
+        raise ValidationError(f"Invalid source_type {groups['source_type']}.")
+    try:
+        command = ExpenseCreate.from_groups(groups)
+    except (InvalidOperation, ValueError) as exc:
+        raise ValidationError(f"Invalid amount or date ({exc}).") from exc
+    if command.amount <= 0:
+        raise ValidationError("Amount must be greater than zero.")
+    return command
+
+
+def _flush(user, batch: list[Expense], stats: ImportStats):
+    if not batch:
+        return
+    deltas: dict[int, Decimal] = defaultdict(Decimal)
+    accounts: dict[int, Account] = {}
+    rollups = RollupDelta()
+    for expense in batch:
+        rollups.add(expense)
+        if expense.source_account is not None:
+            deltas[expense.source_account.pk] -= expense.amount
+            accounts[expense.source_account.pk] = expense.source_account
+    # Each batch commits with its balance changes, so an interrupted import
+    # never leaves balances out of step with the expenses already written.
+    with serialized_for_user(user):
+        Expense.objects.bulk_create(batch)
+        for account_id, delta in deltas.items():
+            adjust_balance(accounts[account_id], delta)
+        rollups.apply()
+        invalidate_user_responses(user)
+    stats.imported += len(batch)
+    batch.clear()
+
+
+def import_expenses(
+    user,
+    lines: Iterable[str],
+    batch_size: int = 1000,
+    progress: Callable[[ImportStats], None] | None = None,
+) -> ImportStats:
+    stats = ImportStats()
+    reader = csv.DictReader(lines)
+    check_columns(reader.fieldnames)
+
+    sources = SourceLookups(user)
+    sources.preload()
+    default_currency = get_user_currency(user)
+    today = timezone.localdate()
+    batch: list[Expense] = []
+    for row in reader:
+        stats.rows += 1
+        try:
+            command = _parse_row(row)
+            expense = Expense(
+                user=user,
+                amount=command.amount,
+                currency=normalize_currency_code(command.currency or default_currency),
+                date=command.date or today,
+                category=sources.category(command.category),
+                source_type=command.source_type,
+                note=(row.get("note") or "").strip(),
+            )
+            if command.source_type == "card":
+                expense.source_card = sources.card(command.source, command.card_last4)
+            else:
+                expense.source_account = sources.account(command.source, command.source_type)
+            expense.fingerprint = fingerprint_for(expense)
+        except ValidationError as exc:
+            stats.skip(reader.line_num, str(exc))
+            continue
+        batch.append(expense)
+        if len(batch) >= batch_size:
+            _flush(user, batch, stats)
+            if progress:
+                progress(stats)
+    _flush(user, batch, stats)
+    if progress:
+        progress(stats)
+    return stats
+
+
+def stage_import(user, upload) -> ImportJob:
+    os.makedirs(settings.IMPORT_STAGING_DIR, exist_ok=True)
+    handle, path = tempfile.mkstemp(suffix=".csv", dir=settings.IMPORT_STAGING_DIR)
+    with os.fdopen(handle, "wb") as staged:
+        for chunk in upload.chunks():
+            staged.write(chunk)
+    return ImportJob.objects.create(user=user, path=path)
+
+
+def claim_import_job() -> ImportJob | None:
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.filter(status=ImportJob.STATUS_PENDING)
+            .select_related("user")
+            .order_by("id")
+            .select_for_update(skip_locked=True, of=("self",))
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def run_import_job(job: ImportJob):
+    # Batches commit as they go, so a job interrupted mid-run is left as
+    # `running` rather than retried: re-running it would duplicate rows.
+    def report(stats: ImportStats):
+        job.stats = stats.as_dict()
+        ImportJob.objects.filter(pk=job.pk).update(stats=job.stats)
+
+    try:
+        with open(job.path, newline="", encoding="utf-8-sig") as handle:
+            stats = import_expenses(job.user, handle, progress=report)
+    except (OSError, UnicodeDecodeError, ValidationError) as exc:
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(exc)
+    except Exception:
+        logger.exception("Import job %s failed.", job.pk)
+        job.status = ImportJob.STATUS_FAILED
+        job.error = "Import failed unexpectedly."
+    else:
+        job.status = ImportJob.STATUS_DONE
+        job.stats = stats.as_dict()
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "stats", "finished_at"])
+    try:
+        os.remove(job.path)
+    except OSError:
+        logger.warning("Could not remove staged import %s.", job.path)
+
+
+def process_import_jobs(limit: int = 1) -> int:
+    processed = 0
+    while processed < limit:
+        job = claim_import_job()
+        if job is None:
+            break
+        run_import_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,75 @@
+import logging
+
+from django.db import transaction
+from django.db.models.functions import Mod
+
+from ..models import Message
+from .batch import BATCH_INTENT, handle_batch, split_commands
+from .errors import IntentRoutingError, ValidationError
+from .handlers import handle_intent
+from .intent_router import route_intent
+from .outbound import deliver_message
+from .scheduler import serialized_for_user
+from .twilio import is_twilio_configured
+from .validation import validate_payload
+
+logger = logging.getLogger(__name__)
+
+ERROR_REPLY = "Sorry, something went wrong. Please try again."
+
+
+def process_message(message: Message) -> str:
+    intent = None
+    try:
+        lines = split_commands(message.raw_text)
+        if len(lines) > 1:
+            intent = BATCH_INTENT
+            reply = handle_batch(message.user, lines)
+        else:
+            intent, command = route_intent(message.raw_text)
+            with serialized_for_user(message.user):
+                validate_payload(intent, command, message.user)
+                reply = handle_intent(message.user, intent, command)
+    except (IntentRoutingError, ValidationError) as exc:
+        logger.warning("Validation error for message %s (intent=%s): %s", message.id, intent or "unknown", exc)
+        message.status = Message.STATUS_REJECTED
+        reply = str(exc)
+    except Exception:
+        logger.exception("Unhandled error processing message %s", message.id)
+        message.status = Message.STATUS_FAILED
+        reply = ERROR_REPLY
+    else:
+        message.status = Message.STATUS_PROCESSED
+    update_fields = ["status"]
+    if intent is not None:
+        message.parsed_intent = intent
+        update_fields.append("parsed_intent")
+    message.save(update_fields=update_fields)
+    return reply
+
+
+def claim_and_process(limit: int = 10, shard: int = 0, shards: int = 1) -> int:
+    queryset = Message.objects.filter(status=Message.STATUS_RECEIVED)
+    if shards > 1:
+        # Each worker owns the users in its shard, so one user's messages are
+        # always handled by the same worker in arrival order.
+        queryset = queryset.annotate(shard=Mod("user_id", shards)).filter(shard=shard)
+    claim = queryset.select_related("user").order_by("id").select_for_update(skip_locked=True, of=("self",))
+    processed = 0
+    while processed < limit:
+        # Each message is claimed and handled in its own short transaction, so
+        # the user's row lock is released as soon as that message commits. A
+        # crashed worker leaves the message in `received` for another worker,
+        # and concurrent workers skip past each other instead of waiting.
+        with transaction.atomic():
+            message = next(iter(claim[:1]), None)
+            if message is None:
+                break
+            reply = process_message(message)
+        processed += 1
+        if is_twilio_configured():
+            try:
+                deliver_message(message.user.phone_number, reply)
+            except Exception:
+                logger.exception("Failed to send reply for queued message.")
+    return processed
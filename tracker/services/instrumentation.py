@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+@dataclass
+class RequestProfile:
+    intent: str | None = None
+    pattern_name: str | None = None
+    outcome: str | None = None
+    queries: int = 0
+    db_time: float = 0.0
+    stages: dict[str, float] = field(default_factory=dict)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for index, bound in enumerate(self.buckets):
+            running += self.counts[index]
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class HistogramRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple, Histogram] = {}
+
+    def observe(self, name: str, labels: dict, value: float, buckets: tuple = LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result: dict[str, list] = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                result.setdefault(name, []).append({"labels": dict(labels), **histogram.snapshot()})
+            return result
+
+
+registry = HistogramRegistry()
+_current_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar(
+    "tracker_request_profile", default=None
+)
+
+
+def current_profile() -> RequestProfile | None:
+    return _current_profile.get()
+
+
+def annotate(**values):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    for key, value in values.items():
+        setattr(profile, key, value)
+
+
+@contextmanager
+def stage(name: str):
+    profile = _current_profile.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.stages[name] = profile.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def _count_queries(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - start
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # Registered for connection_created so every thread's connection reports
+    # into whichever request profile is active in its context, including the
+    # threads sync_to_async runs ORM work in.
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def _record(profile: RequestProfile, status_code: int, elapsed: float):
+    from .metrics import observe_webhook, outcome_for
+
+    observe_webhook(profile.outcome or outcome_for(status_code), profile.intent, elapsed)
+    labels = {
+        "intent": profile.intent or "unknown",
+        "pattern": profile.pattern_name or "unknown",
+        "status": str(status_code),
+    }
+    registry.observe("webhook_request_seconds", labels, elapsed)
+    registry.observe("webhook_db_seconds", labels, profile.db_time)
+    registry.observe("webhook_db_queries", labels, profile.queries, QUERY_BUCKETS)
+    for name, seconds in profile.stages.items():
+        registry.observe("webhook_stage_seconds", {**labels, "stage": name}, seconds)
+
+
+def instrument_webhook(view):
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            profile = RequestProfile()
+            token = _current_profile.set(profile)
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = await view(request, *args, **kwargs)
+                status_code = response.status_code
+                return response
+            finally:
+                _current_profile.reset(token)
+                _record(profile, status_code, time.perf_counter() - start)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = view(request, *args, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            _current_profile.reset(token)
+            _record(profile, status_code, time.perf_counter() - start)
+
+    return wrapper
@@ -1,14 +1,35 @@
+from dataclasses import replace
+
 from .errors import IntentRoutingError
+from .instrumentation import annotate
+from .metrics import PARSE_FAILURES
 from .regex_parser import parse_message
 
+# Intents that change a user's data: they invalidate cached replies and draw
+# on the write rate limit.
+WRITE_INTENTS = {
+    "EXPENSE_CREATE",
+    "EXPENSE_UPDATE",
+    "EXPENSE_DELETE",
+    "ACCOUNT_UPSERT",
+    "CARD_UPSERT",
+    "LOAN_UPSERT",
+    "LOAN_PAYMENT",
+    "CURRENCY_SET",
+}
+
 
 def route_intent(text: str):
     matches = parse_message(text)
     if not matches:
+        PARSE_FAILURES.labels(reason="unsupported").inc()
         raise IntentRoutingError("Unsupported message format.")
     if len(matches) > 1:
+        PARSE_FAILURES.labels(reason="ambiguous").inc()
         raise IntentRoutingError("Ambiguous input. Please clarify your request.")
     match = matches[0]
-    if match.intent == "EXPENSE_CREATE" and not match.data.get("source_type"):
-        match.data["source_type"] = "card"
-    return match.intent, match.data
+    annotate(intent=match.intent, pattern_name=match.pattern_name)
+    command = match.command
+    if match.intent == "EXPENSE_CREATE" and not command.source_type:
+        command = replace(command, source_type="card")
+    return match.intent, command
@@ -0,0 +1,108 @@
+import os
+
+from django.db.models import Count
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from ..models import Message, OutboundMessage
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Metrics are not registered globally: each scrape builds its own registry so
+# the same objects work both in a single process and, when
+# PROMETHEUS_MULTIPROC_DIR is set, through the shared-file collector that sums
+# every gunicorn worker. In that mode the directory must already exist when
+# this module is imported: gunicorn's on_starting hook creates it, and the
+# Docker image creates it for management commands.
+WEBHOOK_REQUESTS = Counter(
+    "expense_bot_webhook_requests_total",
+    "Webhook requests by outcome.",
+    ["status"],
+    registry=None,
+)
+WEBHOOK_LATENCY = Histogram(
+    "expense_bot_webhook_request_seconds",
+    "Webhook request latency by outcome.",
+    ["status"],
+    registry=None,
+)
+INTENTS = Counter(
+    "expense_bot_intents_total",
+    "Routed messages by intent.",
+    ["intent"],
+    registry=None,
+)
+PARSE_FAILURES = Counter(
+    "expense_bot_parse_failures_total",
+    "Messages that could not be routed to a single intent.",
+    ["reason"],
+    registry=None,
+)
+RATE_LIMITED = Counter(
+    "expense_bot_rate_limited_total",
+    "Webhook messages dropped by the per-sender rate limiter.",
+    ["intent_class"],
+    registry=None,
+)
+TWILIO_SEND_LATENCY = Histogram(
+    "expense_bot_twilio_send_seconds",
+    "Latency of outbound Twilio sends.",
+    registry=None,
+)
+TWILIO_SEND_FAILURES = Counter(
+    "expense_bot_twilio_send_failures_total",
+    "Outbound Twilio sends that raised an error.",
+    registry=None,
+)
+
+_METRICS = [
+    WEBHOOK_REQUESTS,
+    WEBHOOK_LATENCY,
+    INTENTS,
+    PARSE_FAILURES,
+    RATE_LIMITED,
+    TWILIO_SEND_LATENCY,
+    TWILIO_SEND_FAILURES,
+]
+
+
+class BacklogCollector:
+    def collect(self):
+        for name, description, model in (
+            ("expense_bot_messages", "Inbound messages by status.", Message),
+            ("expense_bot_outbound_messages", "Outbound messages by status.", OutboundMessage),
+        ):
+            gauge = GaugeMetricFamily(name, description, labels=["status"])
+            counts = dict(model.objects.values_list("status").annotate(total=Count("id")).order_by())
+            for status, _label in model.STATUS_CHOICES:
+                gauge.add_metric([status], counts.pop(status, 0))
+            for status, total in counts.items():
+                gauge.add_metric([status], total)
+            yield gauge
+
+
+def outcome_for(status_code: int) -> str:
+    if status_code < 400:
+        return "ok"
+    if status_code < 500:
+        return "rejected"
+    return "failed"
+
+
+def observe_webhook(outcome: str, intent: str | None, elapsed: float):
+    WEBHOOK_REQUESTS.labels(status=outcome).inc()
+    WEBHOOK_LATENCY.labels(status=outcome).observe(elapsed)
+    if intent:
+        INTENTS.labels(intent=intent).inc()
+
+
+def render_metrics() -> bytes:
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        MultiProcessCollector(registry)
+    else:
+        for metric in _METRICS:
+            registry.register(metric)
+    registry.register(BacklogCollector())
+    return generate_latest(registry)
@@ -1,59 +1,61 @@
-from ..models import Expense
-from .cards import get_outstanding
 from .currency import get_user_currency
+from .expenses import ExpenseWrite
 
 
-def _account_status(expense: Expense) -> str:
-    if not expense.source_account:
+def _account_status(result: ExpenseWrite) -> str:
+    account = result.expense.source_account
+    if not account:
         return ""
-    account = expense.source_account
-    currency = get_user_currency(account.user).upper()
-    return f" Remaining {account.name} {account.type} balance: {account.balance:.2f} {currency}."
+    currency = get_user_currency(result.expense.user).upper()
+    return f" Remaining {account.name} {account.type} balance: {result.balance:.2f} {currency}."
 
 
-def _card_status(expense: Expense) -> str:
-    if not expense.source_card:
+def _card_status(result: ExpenseWrite) -> str:
+    card = result.expense.source_card
+    if not card:
         return ""
-    card = expense.source_card
-    outstanding = get_outstanding(card)
+    outstanding = result.outstanding
     available = card.credit_limit - outstanding
     suffix = f" {card.last4}" if card.last4 else ""
     card_name = f"{card.issuer}{suffix}".strip()
-    currency = get_user_currency(card.user).upper()
+    currency = get_user_currency(result.expense.user).upper()
     return (
         f" Outstanding on {card_name}: {outstanding:.2f} {currency}. "
         f"Available credit: {available:.2f} {currency}."
     )
 
 
-def expense_created(expense: Expense) -> str:
+def expense_created(result: ExpenseWrite) -> str:
+    expense = result.expense
     category = expense.category.name if expense.category else "uncategorized"
     message = (
         f"Added expense {expense.amount:.2f} {expense.currency.upper()} for {category} "
         f"on {expense.date}."
     )
     if expense.source_account:
-        message += _account_status(expense)
+        message += _account_status(result)
     elif expense.source_card:
-        message += _card_status(expense)
+        message += _card_status(result)
     return message
 
 
-def expense_updated(expense: Expense) -> str:
+def expense_updated(result: ExpenseWrite) -> str:
+    expense = result.expense
     message = f"Updated expense {expense.id}."
     if expense.source_account:
-        message += _account_status(expense)
+        message += _account_status(result)
     elif expense.source_card:
-        message += _card_status(expense)
+        message += _card_status(result)
     return message
 
 
-def expense_deleted(expense_id: int, account=None) -> str:
+def expense_deleted(expense_id: int, result: ExpenseWrite) -> str:
     message = f"Deleted expense {expense_id}."
+    account = result.expense.source_account
     if account:
-        currency = get_user_currency(account.user).upper()
+        currency = get_user_currency(result.expense.user).upper()
         message += (
-            f" Restored {account.name} {account.type} balance: {account.balance:.2f} {currency}."
+            f" Restored {account.name} {account.type} balance: {result.balance:.2f} {currency}."
         )
     return message
 
@@ -0,0 +1,103 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from ..models import OutboundMessage
+from .twilio import asend_whatsapp_message, send_whatsapp_message
+
+logger = logging.getLogger(__name__)
+
+_UNSENT_STATUSES = [OutboundMessage.STATUS_PENDING, OutboundMessage.STATUS_SENDING]
+
+
+def enqueue_message(to_number: str, body: str) -> OutboundMessage:
+    return OutboundMessage.objects.create(to_number=to_number, body=body)
+
+
+async def aenqueue_message(to_number: str, body: str) -> OutboundMessage:
+    return await OutboundMessage.objects.acreate(to_number=to_number, body=body)
+
+
+def deliver_message(to_number: str, body: str):
+    if settings.TWILIO_OUTBOUND_QUEUE:
+        enqueue_message(to_number, body)
+    else:
+        send_whatsapp_message(to_number, body)
+
+
+async def adeliver_message(to_number: str, body: str):
+    if settings.TWILIO_OUTBOUND_QUEUE:
+        await aenqueue_message(to_number, body)
+    else:
+        await asend_whatsapp_message(to_number, body)
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = settings.OUTBOUND_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.OUTBOUND_BACKOFF_MAX_SECONDS))
+
+
+def claim_messages(limit: int) -> list[OutboundMessage]:
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.OUTBOUND_LEASE_SECONDS)
+    # A message is only eligible once every earlier message to the same number
+    # has been sent or has given up, which keeps per-destination ordering even
+    # with several workers claiming concurrently.
+    earlier_unsent = OutboundMessage.objects.filter(
+        to_number=OuterRef("to_number"),
+        id__lt=OuterRef("id"),
+        status__in=_UNSENT_STATUSES,
+    )
+    with transaction.atomic():
+        messages = list(
+            OutboundMessage.objects.filter(
+                Q(status=OutboundMessage.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=OutboundMessage.STATUS_SENDING, locked_at__lt=stale_before)
+            )
+            .filter(~Exists(earlier_unsent))
+            .order_by("id")
+            .select_for_update(skip_locked=True)[:limit]
+        )
+        OutboundMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            status=OutboundMessage.STATUS_SENDING,
+            locked_at=now,
+        )
+    for message in messages:
+        message.status = OutboundMessage.STATUS_SENDING
+        message.locked_at = now
+    return messages
+
+
+def send_claimed(message: OutboundMessage) -> bool:
+    message.attempts += 1
+    message.locked_at = None
+    try:
+        sid = send_whatsapp_message(message.to_number, message.body)
+    except Exception as exc:
+        message.last_error = str(exc)[:1000]
+        if message.attempts >= settings.OUTBOUND_MAX_ATTEMPTS:
+            message.status = OutboundMessage.STATUS_FAILED
+            logger.error("Giving up on outbound message %s after %s attempts.", message.id, message.attempts)
+        else:
+            message.status = OutboundMessage.STATUS_PENDING
+            message.next_attempt_at = timezone.now() + _backoff(message.attempts)
+            logger.warning("Outbound message %s failed (attempt %s): %s", message.id, message.attempts, exc)
+        message.save(update_fields=["attempts", "locked_at", "last_error", "status", "next_attempt_at"])
+        return False
+
+    message.status = OutboundMessage.STATUS_SENT
+    message.provider_sid = sid or ""
+    message.sent_at = timezone.now()
+    message.save(update_fields=["attempts", "locked_at", "status", "provider_sid", "sent_at"])
+    return True
+
+
+def process_batch(limit: int = 20) -> int:
+    messages = claim_messages(limit)
+    for message in messages:
+        send_claimed(message)
+    return len(messages)
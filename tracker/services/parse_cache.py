@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class ParseCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._day = None
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, normalized: str, parse: Callable[[str], list]) -> tuple:
+        if self.maxsize <= 0:
+            return tuple(parse(normalized))
+        # Entries are only valid for the local day they were parsed on, so any
+        # date-relative value is recomputed after midnight.
+        today = timezone.localdate()
+        with self._lock:
+            if today != self._day:
+                self._entries.clear()
+                self._day = today
+            cached = self._entries.get(normalized)
+            if cached is not None:
+                self._entries.move_to_end(normalized)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        result = tuple(parse(normalized))
+        with self._lock:
+            if self._day == today:
+                self._entries[normalized] = result
+                self._entries.move_to_end(normalized)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._day = None
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+_parse_cache: ParseCache | None = None
+
+
+def get_parse_cache() -> ParseCache:
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache(maxsize=getattr(settings, "PARSE_CACHE_SIZE", 1024))
+    return _parse_cache
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from ..models import RateLimitBucket
+from .batch import MAX_BATCH_LINES, split_commands
+from .intent_router import WRITE_INTENTS
+from .metrics import RATE_LIMITED
+from .regex_parser import parse_message
+
+
+def _is_write(line: str) -> bool:
+    try:
+        return any(match.intent in WRITE_INTENTS for match in parse_message(line))
+    except ValueError:
+        # Invalid dates fail during conversion; the handler rejects the line.
+        return False
+
+
+def intent_class(text: str) -> tuple[str, int]:
+    # Parsing is pure Python and cached, so classifying costs no queries.
+    # Unparseable text counts as a read: it is rejected before any writes.
+    # Oversized batches are rejected whole, so only the first lines are read.
+    writes = sum(_is_write(line) for line in split_commands(text)[: MAX_BATCH_LINES + 1])
+    if writes:
+        return "write", writes
+    return "read", 1
+
+
+def _refill(tokens: float, updated_at: float, now: float, burst: float, per_second: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated_at) * per_second)
+
+
+class LocalBuckets:
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, burst: float, per_second: float, cost: int = 1) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated_at, now, burst, per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBuckets:
+    def take(self, key: str, burst: float, per_second: float, cost: int = 1) -> bool:
+        now = time.time()
+        with transaction.atomic():
+            bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+                key=key,
+                defaults={"tokens": burst, "updated_at": now},
+            )
+            tokens = _refill(bucket.tokens, bucket.updated_at, now, burst, per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket.tokens = tokens
+            bucket.updated_at = now
+            bucket.save(update_fields=["tokens", "updated_at"])
+        return allowed
+
+    def clear(self):
+        RateLimitBucket.objects.all().delete()
+
+
+RATE_LIMIT_BACKENDS = {
+    "local": lambda: LocalBuckets(settings.RATE_LIMIT_LOCAL_MAX_KEYS),
+    "database": DatabaseBuckets,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    factory = RATE_LIMIT_BACKENDS[settings.RATE_LIMIT_BACKEND]
+                except KeyError as exc:
+                    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}") from exc
+                _backend = factory()
+    return _backend
+
+
+def _limits_for(kind: str) -> tuple[float, float]:
+    if kind == "write":
+        return settings.RATE_LIMIT_WRITE_BURST, settings.RATE_LIMIT_WRITE_PER_MINUTE / 60
+    return settings.RATE_LIMIT_READ_BURST, settings.RATE_LIMIT_READ_PER_MINUTE / 60
+
+
+def is_throttled(sender: str, text: str) -> bool:
+    if not settings.RATE_LIMIT_ENABLED:
+        return False
+    kind, cost = intent_class(text)
+    burst, per_second = _limits_for(kind)
+    # Each write line costs a token, so a batch cannot bypass the write limit.
+    if get_rate_limit_backend().take(f"{kind}:{sender}", burst, per_second, cost):
+        return False
+    RATE_LIMITED.labels(intent_class=kind).inc()
+    return True
+
+
+async def ais_throttled(sender: str, text: str) -> bool:
+    if isinstance(get_rate_limit_backend(), LocalBuckets):
+        return is_throttled(sender, text)
+    return await sync_to_async(is_throttled)(sender, text)
@@ -1,15 +1,23 @@
 import re
 from dataclasses import dataclass
-from decimal import Decimal
-from typing import Any
 
-from django.utils import timezone
+from django.conf import settings
+
+from . import commands
+from .parse_cache import get_parse_cache
+
+try:
+    # Private sre modules: used only to build the first-word dispatch index.
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    sre_constants = sre_parse = None
 
 
 @dataclass(frozen=True)
 class ParsedMatch:
     intent: str
-    data: dict[str, Any]
+    command: object
     pattern_name: str
 
 
@@ -27,30 +35,12 @@ def preprocess_message(text: str) -> str:
     return normalized
 
 
-def _parse_amount(value: str | None) -> Decimal | None:
-    if not value:
-        return None
-    return Decimal(value)
-
-
-def _parse_int(value: str | None) -> int | None:
-    if not value:
-        return None
-    return int(value)
-
-
-def _parse_date(value: str | None):
-    if not value:
-        return None
-    if "-" in value:
-        return timezone.datetime.strptime(value, "%Y-%m-%d").date()
-    return timezone.datetime.strptime(value, "%d/%m/%Y").date()
-
-
 PATTERNS = [
     {
         "name": "expense_create_card",
         "intent": "EXPENSE_CREATE",
+        "command": commands.ExpenseCreate,
+        "defaults": {"source_type": "card"},
         "pattern": re.compile(
             r"^spent (?P<amount>\d+(?:\.\d{1,2})?) ?(?P<currency>[a-z]{2,5})? on "
             r"(?P<category>[a-z][a-z ]{1,30}[a-z]) from "
@@ -62,6 +52,7 @@ PATTERNS = [
     {
         "name": "expense_create_account",
         "intent": "EXPENSE_CREATE",
+        "command": commands.ExpenseCreate,
         "pattern": re.compile(
             r"^spent (?P<amount>\d+(?:\.\d{1,2})?) ?(?P<currency>[a-z]{2,5})? on "
             r"(?P<category>[a-z][a-z ]{1,30}[a-z]) from "
@@ -73,6 +64,7 @@ PATTERNS = [
     {
         "name": "expense_update",
         "intent": "EXPENSE_UPDATE",
+        "command": commands.ExpenseUpdate,
         "pattern": re.compile(
             r"^update expense (?P<expense_id>\d+) amount "
             r"(?P<amount>\d+(?:\.\d{1,2})?) ?(?P<currency>[a-z]{2,5})?"
@@ -86,11 +78,13 @@ PATTERNS = [
     {
         "name": "expense_delete",
         "intent": "EXPENSE_DELETE",
+        "command": commands.ExpenseDelete,
         "pattern": re.compile(r"^(delete|remove) expense (?P<expense_id>\d+)$"),
     },
     {
         "name": "balance_query_account",
         "intent": "BALANCE_QUERY",
+        "command": commands.BalanceQuery,
         "pattern": re.compile(
             r"^balance of (?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9]) "
             r"(?P<source_type>account|cash)$"
@@ -99,6 +93,8 @@ PATTERNS = [
     {
         "name": "balance_query_card",
         "intent": "BALANCE_QUERY",
+        "command": commands.BalanceQuery,
+        "defaults": {"source_type": "card"},
         "pattern": re.compile(
             r"^balance of (?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9]) card"
             r"(?: last4 (?P<card_last4>\d{4}))?$"
@@ -107,6 +103,7 @@ PATTERNS = [
     {
         "name": "summary_query_month",
         "intent": "SUMMARY_QUERY",
+        "command": commands.SummaryQuery,
         "pattern": re.compile(
             r"^(show|summary) expenses for (?P<month>jan|january|feb|february|mar|march|"
             r"apr|april|may|jun|june|jul|july|aug|august|sep|sept|september|oct|october|"
@@ -116,11 +113,50 @@ PATTERNS = [
     {
         "name": "summary_query_relative",
         "intent": "SUMMARY_QUERY",
+        "command": commands.SummaryQuery,
         "pattern": re.compile(r"^(show|summary) expenses (?P<relative_period>this month|last month)$"),
     },
+    {
+        "name": "summary_by_category",
+        "intent": "CATEGORY_SUMMARY",
+        "command": commands.CategorySummary,
+        "pattern": re.compile(
+            r"^(show )?summary by category(?: for (?P<month>jan|january|feb|february|mar|march|"
+            r"apr|april|may|jun|june|jul|july|aug|august|sep|sept|september|oct|october|"
+            r"nov|november|dec|december)(?: (?P<year>20\d{2}))?| (?P<relative_period>this month|last month))?$"
+        ),
+    },
+    {
+        "name": "summary_compare_months",
+        "intent": "MONTH_COMPARISON",
+        "command": commands.MonthComparison,
+        "pattern": re.compile(r"^compare this month (vs|with|to) last month$"),
+    },
+    {
+        "name": "summary_trend",
+        "intent": "SPEND_TREND",
+        "command": commands.SpendTrend,
+        "pattern": re.compile(r"^(show )?(spending |expense )?trend(?: (for )?(the )?last 12 months)?$"),
+    },
+    {
+        "name": "spending_insights",
+        "intent": "INSIGHTS_QUERY",
+        "command": commands.InsightsQuery,
+        "pattern": re.compile(
+            r"^(show )?(spending |expense )?"
+            r"(?P<metric>insights|moving averages|averages|growth|velocity|forecast|projection)$"
+        ),
+    },
+    {
+        "name": "ledger_export",
+        "intent": "LEDGER_EXPORT",
+        "command": commands.LedgerExport,
+        "pattern": re.compile(r"^export (ledger|expenses|transactions|data)(?: as (?P<format>csv|json))?$"),
+    },
     {
         "name": "credit_card_query",
         "intent": "CREDIT_CARD_QUERY",
+        "command": commands.CreditCardQuery,
         "pattern": re.compile(
             r"^(?P<metric>due|available credit|outstanding) for "
             r"(?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9]) card"
@@ -130,21 +166,32 @@ PATTERNS = [
     {
         "name": "account_list",
         "intent": "ACCOUNT_LIST",
+        "command": commands.AccountList,
         "pattern": re.compile(r"^((list|show) )?accounts$"),
     },
     {
         "name": "card_list",
         "intent": "CARD_LIST",
+        "command": commands.CardList,
         "pattern": re.compile(r"^((list|show) )?cards$"),
     },
     {
         "name": "transaction_list",
         "intent": "TRANSACTION_LIST",
-        "pattern": re.compile(r"^((list|show) )?(transactions|expenses)$"),
+        "command": commands.TransactionList,
+        "pattern": re.compile(
+            r"^((list|show) )?(?P<more>more )?(transactions|expenses)"
+            r"(?: before (?P<before_id>\d+))?"
+            r"(?: category (?P<category>[a-z][a-z ]{1,30}?[a-z]))?"
+            r"(?: from (?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9]) (?P<source_type>account|cash|card))?"
+            r"(?: between (?P<date_from>\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}) "
+            r"and (?P<date_to>\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}))?$"
+        ),
     },
     {
         "name": "loan_upsert",
         "intent": "LOAN_UPSERT",
+        "command": commands.LoanUpsert,
         "pattern": re.compile(
             r"^(add|create|set) loan "
             r"(?P<loan_name>[a-z0-9][a-z0-9 ]{1,40}[a-z0-9]) amount "
@@ -155,6 +202,7 @@ PATTERNS = [
     {
         "name": "loan_payment",
         "intent": "LOAN_PAYMENT",
+        "command": commands.LoanPayment,
         "pattern": re.compile(
             r"^pay loan (?P<loan_name>[a-z0-9][a-z0-9 ]{1,40}[a-z0-9]) amount "
             r"(?P<amount>\d+(?:\.\d{1,2})?) ?(?P<currency>[a-z]{2,5})?"
@@ -164,11 +212,13 @@ PATTERNS = [
     {
         "name": "loan_list",
         "intent": "LOAN_LIST",
+        "command": commands.LoanList,
         "pattern": re.compile(r"^((list|show) )?loans$"),
     },
     {
         "name": "account_upsert",
         "intent": "ACCOUNT_UPSERT",
+        "command": commands.AccountUpsert,
         "pattern": re.compile(
             r"^(add|create|update|set) account "
             r"(?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9]) "
@@ -179,6 +229,7 @@ PATTERNS = [
     {
         "name": "card_upsert",
         "intent": "CARD_UPSERT",
+        "command": commands.CardUpsert,
         "pattern": re.compile(
             r"^(add|create|update|set) card "
             r"(?P<source>[a-z0-9][a-z0-9 ]{1,30}[a-z0-9])(?: card)? "
@@ -190,16 +241,19 @@ PATTERNS = [
     {
         "name": "category_list",
         "intent": "CATEGORY_LIST",
+        "command": commands.CategoryList,
         "pattern": re.compile(r"^((list|show) )?categories$"),
     },
     {
         "name": "help",
         "intent": "HELP",
+        "command": commands.Help,
         "pattern": re.compile(r"^(help|commands)(?: (?P<help_topic>[a-z]+(?: [a-z]+)*))?$"),
     },
     {
         "name": "currency_set",
         "intent": "CURRENCY_SET",
+        "command": commands.CurrencySet,
         "pattern": re.compile(
             r"^(?:set|update)? ?(?:default )?currency(?: to)? (?P<currency>[a-z]{2,5})$"
         ),
@@ -207,25 +261,210 @@ PATTERNS = [
 ]
 
 
-def parse_message(text: str) -> list[ParsedMatch]:
-    normalized = preprocess_message(text)
+def _walk_leading_words(items, prefixes: set[str]):
+    # Expands the literal head of a parsed pattern up to the first space. Returns
+    # (completed words, still-open prefixes), or None once a non-literal element
+    # is reached before the first word is fully known.
+    completed: set[str] = set()
+    open_prefixes = set(prefixes)
+    for op, av in items:
+        if not open_prefixes:
+            break
+        if op is sre_constants.AT:
+            if av is sre_constants.AT_END:
+                completed |= open_prefixes
+                open_prefixes = set()
+            continue
+        if op is sre_constants.LITERAL or op is sre_constants.IN:
+            if op is sre_constants.LITERAL:
+                chars = [chr(av)]
+            elif all(item_op is sre_constants.LITERAL for item_op, _value in av):
+                chars = [chr(value) for _item_op, value in av]
+            else:
+                return None
+            next_prefixes: set[str] = set()
+            for char in chars:
+                if char == " ":
+                    completed |= open_prefixes
+                else:
+                    next_prefixes |= {prefix + char for prefix in open_prefixes}
+            open_prefixes = next_prefixes
+            continue
+        if op is sre_constants.SUBPATTERN:
+            _group, add_flags, del_flags, subpattern = av
+            if add_flags or del_flags:
+                return None
+            result = _walk_leading_words(subpattern, open_prefixes)
+            if result is None:
+                return None
+            completed |= result[0]
+            open_prefixes = result[1]
+            continue
+        if op is sre_constants.BRANCH:
+            next_prefixes = set()
+            for branch in av[1]:
+                result = _walk_leading_words(branch, open_prefixes)
+                if result is None:
+                    return None
+                completed |= result[0]
+                next_prefixes |= result[1]
+            open_prefixes = next_prefixes
+            continue
+        if op is sre_constants.MAX_REPEAT or op is sre_constants.MIN_REPEAT:
+            low, high, subpattern = av
+            if (low, high) not in {(0, 1), (1, 1)}:
+                return None
+            result = _walk_leading_words(subpattern, open_prefixes)
+            if result is None:
+                return None
+            completed |= result[0]
+            open_prefixes = result[1] | (open_prefixes if low == 0 else set())
+            continue
+        return None
+    return completed, open_prefixes
+
+
+def _leading_words(pattern: re.Pattern) -> set[str] | None:
+    # Any surprise from the sre internals leaves the pattern unindexed, which
+    # only costs a full scan for it.
+    if sre_parse is None or pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        result = _walk_leading_words(sre_parse.parse(pattern.pattern, pattern.flags), {""})
+    except Exception:
+        return None
+    if result is None:
+        return None
+    completed, open_prefixes = result
+    if open_prefixes:
+        return None
+    return completed
+
+
+def build_dispatch_index(patterns: list[dict]):
+    keyed_positions: dict[str, list[int]] = {}
+    unindexed_positions: list[int] = []
+    for position, spec in enumerate(patterns):
+        words = _leading_words(spec["pattern"])
+        if words is None:
+            unindexed_positions.append(position)
+            continue
+        for word in words:
+            keyed_positions.setdefault(word, []).append(position)
+    index = {
+        word: tuple(patterns[position] for position in sorted({*positions, *unindexed_positions}))
+        for word, positions in keyed_positions.items()
+    }
+    unindexed = tuple(patterns[position] for position in unindexed_positions)
+    return index, unindexed
+
+
+_DISPATCH_INDEX, _UNINDEXED_PATTERNS = build_dispatch_index(PATTERNS)
+
+
+def candidate_patterns(normalized: str):
+    first_word = normalized.partition(" ")[0]
+    return _DISPATCH_INDEX.get(first_word, _UNINDEXED_PATTERNS)
+
+
+def _build_match(spec: dict, groups: dict) -> ParsedMatch:
+    defaults = spec.get("defaults")
+    if defaults:
+        groups.update(defaults)
+    return ParsedMatch(
+        intent=spec["intent"],
+        command=spec["command"].from_groups(groups),
+        pattern_name=spec["name"],
+    )
+
+
+def parse_normalized(normalized: str) -> list[ParsedMatch]:
     matches: list[ParsedMatch] = []
-    for spec in PATTERNS:
+    for spec in candidate_patterns(normalized):
         match = spec["pattern"].match(normalized)
         if not match:
             continue
-        data = match.groupdict()
-        if spec["name"] == "expense_create_card":
-            data["source_type"] = "card"
-        if spec["name"] == "balance_query_card":
-            data["source_type"] = "card"
-        data["amount"] = _parse_amount(data.get("amount"))
-        data["balance"] = _parse_amount(data.get("balance"))
-        data["credit_limit"] = _parse_amount(data.get("credit_limit"))
-        data["billing_cycle_day"] = _parse_int(data.get("billing_cycle_day"))
-        data["expense_id"] = int(data["expense_id"]) if data.get("expense_id") else None
-        data["date"] = _parse_date(data.get("date"))
-        if data.get("card_last4"):
-            data["card_last4"] = data["card_last4"].strip()
-        matches.append(ParsedMatch(intent=spec["intent"], data=data, pattern_name=spec["name"]))
+        matches.append(_build_match(spec, match.groupdict()))
     return matches
+
+
+_GROUP_NAME_RE = re.compile(r"\(\?P(?P<kind>[<=])(?P<name>\w+)")
+
+
+class CombinedMatcher:
+    # A run of patterns compiled into one alternation with per-branch named
+    # groups. One match() call finds the first pattern that matches; only
+    # then is the alternation over the patterns after it tried, so ambiguous
+    # input is still reported and a message that matches nothing is scanned
+    # once.
+    def __init__(self, specs: tuple[dict, ...]):
+        if any(spec["pattern"].flags != re.UNICODE for spec in specs):
+            raise ValueError("Combined patterns must be compiled without flags.")
+        self.specs = specs
+        self.suffixes = [self._compile(start) for start in range(len(specs))]
+
+    def _compile(self, start: int):
+        branches = []
+        for position in range(start, len(self.specs)):
+            body = _GROUP_NAME_RE.sub(
+                lambda group: f"(?P{group['kind']}b{position}_{group['name']}",
+                self.specs[position]["pattern"].pattern,
+            )
+            branches.append(f"(?P<b{position}>{body})")
+        pattern = re.compile("|".join(branches))
+        lookup = {}
+        for position in range(start, len(self.specs)):
+            spec = self.specs[position]
+            names = tuple(spec["pattern"].groupindex)
+            indexes = tuple(pattern.groupindex[f"b{position}_{name}"] for name in names)
+            lookup[pattern.groupindex[f"b{position}"]] = (position, spec, names, indexes)
+        return pattern, lookup
+
+    def parse(self, normalized: str) -> list[ParsedMatch]:
+        matches: list[ParsedMatch] = []
+        start = 0
+        while start < len(self.specs):
+            pattern, lookup = self.suffixes[start]
+            match = pattern.match(normalized)
+            if not match:
+                break
+            # A branch's group closes after the groups inside it, so it is
+            # always the match's lastindex.
+            position, spec, names, indexes = lookup[match.lastindex]
+            if len(indexes) == 1:
+                values = (match.group(indexes[0]),)
+            else:
+                values = match.group(*indexes) if indexes else ()
+            matches.append(_build_match(spec, dict(zip(names, values))))
+            start = position + 1
+        return matches
+
+
+_COMBINED_INDEX = {word: CombinedMatcher(specs) for word, specs in _DISPATCH_INDEX.items()}
+_COMBINED_UNINDEXED = CombinedMatcher(_UNINDEXED_PATTERNS) if _UNINDEXED_PATTERNS else None
+
+
+def parse_combined(normalized: str) -> list[ParsedMatch]:
+    first_word = normalized.partition(" ")[0]
+    matcher = _COMBINED_INDEX.get(first_word, _COMBINED_UNINDEXED)
+    return matcher.parse(normalized) if matcher else []
+
+
+PARSER_ENGINES = {
+    "sequential": parse_normalized,
+    "combined": parse_combined,
+}
+
+
+def get_parser_engine():
+    try:
+        return PARSER_ENGINES[settings.PARSER_ENGINE]
+    except KeyError:
+        raise ValueError(f"Unknown parser engine: {settings.PARSER_ENGINE}") from None
+
+
+def parse_message(text: str) -> list[ParsedMatch]:
+    normalized = preprocess_message(text)
+    # Matches and their commands are immutable, so cached results can be
+    # shared between callers as-is.
+    return list(get_parse_cache().get_or_parse(normalized, get_parser_engine()))
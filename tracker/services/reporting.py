@@ -1,10 +1,11 @@
-from calendar import monthrange
-from datetime import date, timedelta
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
 
 from django.db.models import Sum
 from django.utils import timezone
 
-from ..models import Expense
+from ..models import SpendRollup
 from .currency import get_user_currency
 
 
@@ -36,9 +37,19 @@ MONTH_MAP = {
 }
 
 
-def _month_window(month: int, year: int):
-    last_day = monthrange(year, month)[1]
-    return date(year, month, 1), date(year, month, last_day)
+def shift_month(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_total(user, month_start: date):
+    # Reads the month's rollup rows (one per category and currency) instead of
+    # summing raw expenses.
+    return (
+        SpendRollup.objects.filter(user=user, period=SpendRollup.PERIOD_MONTH, period_start=month_start)
+        .aggregate(total=Sum("total"))
+        .get("total")
+    ) or 0
 
 
 def summarize_month(user, month_name: str, year: int | None) -> str:
@@ -47,27 +58,139 @@ def summarize_month(user, month_name: str, year: int | None) -> str:
         return "Invalid month."
     if not year:
         year = timezone.localdate().year
-    start, end = _month_window(month, year)
-    total = (
-        Expense.objects.filter(user=user, date__gte=start, date__lte=end)
-        .aggregate(total=Sum("amount"))
-        .get("total")
-    ) or 0
+    total = _month_total(user, date(year, month, 1))
     currency = get_user_currency(user).upper()
     return f"Total expenses for {month_name} {year}: {total:.2f} {currency}"
 
 
 def summarize_relative(user, relative_period: str) -> str:
-    today = timezone.localdate()
-    if relative_period == "this month":
-        start, end = _month_window(today.month, today.year)
-    else:
-        prev_month = today.replace(day=1) - timedelta(days=1)
-        start, end = _month_window(prev_month.month, prev_month.year)
-    total = (
-        Expense.objects.filter(user=user, date__gte=start, date__lte=end)
-        .aggregate(total=Sum("amount"))
-        .get("total")
-    ) or 0
+    start = timezone.localdate().replace(day=1)
+    if relative_period != "this month":
+        start = shift_month(start, -1)
+    total = _month_total(user, start)
     currency = get_user_currency(user).upper()
     return f"Total expenses for {relative_period}: {total:.2f} {currency}"
+
+
+def _resolve_month(month_name: str | None, year: int | None, relative_period: str | None) -> date | None:
+    this_month = timezone.localdate().replace(day=1)
+    if relative_period == "last month":
+        return shift_month(this_month, -1)
+    if not month_name:
+        return this_month
+    month = MONTH_MAP.get(month_name)
+    if not month:
+        return None
+    return date(year or this_month.year, month, 1)
+
+
+def _monthly_rollups(user):
+    return SpendRollup.objects.filter(user=user, period=SpendRollup.PERIOD_MONTH)
+
+
+def _currency_order(user, currencies) -> list[str]:
+    # Rollups are kept per currency and amounts are never converted, so each
+    # currency is reported on its own, the user's default first.
+    default = get_user_currency(user)
+    return sorted(set(currencies), key=lambda code: (code != default, code))
+
+
+def _format_amounts(user, amounts: dict[str, Decimal]) -> str:
+    parts = [f"{amounts[code]:.2f} {code.upper()}" for code in _currency_order(user, amounts) if amounts[code]]
+    return " + ".join(parts) or f"0.00 {get_user_currency(user).upper()}"
+
+
+def summarize_by_category(user, month_name: str | None, year: int | None, relative_period: str | None) -> str:
+    start = _resolve_month(month_name, year, relative_period)
+    if start is None:
+        return "Invalid month."
+    rows = list(
+        _monthly_rollups(user)
+        .filter(period_start=start)
+        .values_list("category_name", "currency")
+        .annotate(total=Sum("total"))
+        .order_by("-total", "category_name")
+    )
+    label = start.strftime("%B %Y")
+    grand_totals: dict[str, Decimal] = defaultdict(Decimal)
+    for _name, currency, total in rows:
+        grand_totals[currency] += total
+    if not any(grand_totals.values()):
+        return f"No expenses recorded for {label}."
+    order = _currency_order(user, grand_totals)
+    rows.sort(key=lambda row: order.index(row[1]))
+    lines = [
+        f"- {name or 'uncategorized'}: {total:.2f} {currency.upper()} ({total / grand_totals[currency]:.0%})"
+        for name, currency, total in rows
+        if total
+    ]
+    return f"Expenses by category for {label}:\n" + "\n".join(lines) + f"\nTotal: {_format_amounts(user, grand_totals)}"
+
+
+def compare_months(user) -> str:
+    this_month = timezone.localdate().replace(day=1)
+    last_month = shift_month(this_month, -1)
+    by_category: dict[tuple[str, str], dict[date, Decimal]] = defaultdict(dict)
+    totals = {this_month: defaultdict(Decimal), last_month: defaultdict(Decimal)}
+    rows = (
+        _monthly_rollups(user)
+        .filter(period_start__in=[this_month, last_month])
+        .values_list("period_start", "category_name", "currency")
+        .annotate(total=Sum("total"))
+        .order_by()
+    )
+    for period_start, name, currency, total in rows:
+        by_category[(name or "uncategorized", currency)][period_start] = total
+        totals[period_start][currency] += total
+    currencies = _currency_order(user, [*totals[this_month], *totals[last_month]]) or [get_user_currency(user)]
+    changes = []
+    for currency in currencies:
+        change = totals[this_month][currency] - totals[last_month][currency]
+        changes.append(f"{change:+.2f} {currency.upper()}" + _percent_change(totals[last_month][currency], change))
+    lines = [
+        f"This month: {_format_amounts(user, totals[this_month])}",
+        f"Last month: {_format_amounts(user, totals[last_month])}",
+        "Change: " + ", ".join(changes),
+    ]
+    deltas = sorted(
+        (
+            (months.get(this_month, Decimal("0.00")) - months.get(last_month, Decimal("0.00")), name, currency)
+            for (name, currency), months in by_category.items()
+        ),
+        key=lambda item: (currencies.index(item[2]), -abs(item[0]), item[1]),
+    )
+    category_lines = [f"- {name}: {delta:+.2f} {currency.upper()}" for delta, name, currency in deltas if delta]
+    if category_lines:
+        lines.append("By category:")
+        lines.extend(category_lines)
+    return "\n".join(lines)
+
+
+def _percent_change(previous: Decimal, change: Decimal) -> str:
+    if not previous:
+        return ""
+    return f" ({change / previous:+.0%})"
+
+
+def spending_trend(user, months: int = 12) -> str:
+    this_month = timezone.localdate().replace(day=1)
+    starts = [shift_month(this_month, offset) for offset in range(-(months - 1), 1)]
+    totals: dict[date, dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    overall: dict[str, Decimal] = defaultdict(Decimal)
+    rows = (
+        _monthly_rollups(user)
+        .filter(period_start__gte=starts[0], period_start__lte=this_month)
+        .values_list("period_start", "currency")
+        .annotate(total=Sum("total"))
+        .order_by()
+    )
+    for period_start, currency, total in rows:
+        totals[period_start][currency] += total
+        overall[currency] += total
+    lines = [f"- {start:%b %Y}: {_format_amounts(user, totals[start])}" for start in starts]
+    average = {currency: total / months for currency, total in overall.items()}
+    return (
+        f"Spending over the last {months} months:\n"
+        + "\n".join(lines)
+        + f"\nAverage: {_format_amounts(user, average)} per month"
+    )
@@ -0,0 +1,52 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import WhatsAppUser
+
+CACHEABLE_INTENTS = {
+    "ACCOUNT_LIST",
+    "CARD_LIST",
+    "CATEGORY_LIST",
+    "LOAN_LIST",
+    "SUMMARY_QUERY",
+    "CATEGORY_SUMMARY",
+    "MONTH_COMPARISON",
+    "SPEND_TREND",
+    "INSIGHTS_QUERY",
+}
+
+
+def invalidate_user_responses(user):
+    # The generation lives on the user row, so a write in any worker, import
+    # or management command retires every process's cached replies. Callers
+    # bump it inside the write's own transaction while holding the user's row
+    # lock, so it commits or rolls back together with the write and no read
+    # can slip in between. Moving to the clock rather than +1 means a
+    # rolled-back bump is never reused for different data.
+    generation = max(user.reply_generation + 1, time.time_ns())
+    WhatsAppUser.objects.filter(pk=user.pk).update(
+        reply_generation=Greatest(F("reply_generation") + 1, Value(generation))
+    )
+    user.reply_generation = generation
+
+
+def cached_reply(user, intent: str, command, build) -> str:
+    ttl = settings.RESPONSE_CACHE_TTL_SECONDS
+    if intent not in CACHEABLE_INTENTS or ttl <= 0:
+        return build()
+    # Relative periods and card statement windows depend on today's date.
+    fingerprint = hashlib.sha1(f"{intent}:{command!r}:{timezone.localdate()}".encode("utf-8")).hexdigest()
+    # serialized_for_user reads the generation with the row lock every message
+    # already takes, so a cached reply costs no query of its own.
+    key = f"tracker:reply:{user.pk}:{user.reply_generation}:{fingerprint}"
+    reply = cache.get(key)
+    if reply is None:
+        reply = build()
+        cache.set(key, reply, ttl)
+    return reply
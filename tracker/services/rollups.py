@@ -0,0 +1,112 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Sum
+
+from ..models import Expense, SpendRollup
+from .response_cache import invalidate_user_responses
+
+
+def _key(expense: Expense, period: str):
+    start = expense.date if period == SpendRollup.PERIOD_DAY else expense.date.replace(day=1)
+    category_name = expense.category.name if expense.category else ""
+    return (expense.user_id, period, start, category_name, expense.currency)
+
+
+class RollupDelta:
+    # Collects per-key changes so one expense write (or a whole import batch)
+    # becomes a single upsert statement.
+    def __init__(self):
+        self.changes: dict[tuple, list] = defaultdict(lambda: [Decimal("0.00"), 0])
+
+    def add(self, expense: Expense, sign: int = 1):
+        for period in (SpendRollup.PERIOD_DAY, SpendRollup.PERIOD_MONTH):
+            change = self.changes[_key(expense, period)]
+            change[0] += sign * expense.amount
+            change[1] += sign
+
+    def apply(self):
+        rows = [(key, total, count) for key, (total, count) in self.changes.items() if total or count]
+        self.changes.clear()
+        if not rows:
+            return
+        meta = SpendRollup._meta
+        quote = connection.ops.quote_name
+        table = quote(meta.db_table)
+        fields = [
+            meta.get_field(name)
+            for name in ("user", "period", "period_start", "category_name", "currency", "total", "expense_count")
+        ]
+        columns = ", ".join(quote(field.column) for field in fields)
+        key_columns = ", ".join(quote(field.column) for field in fields[:5])
+        placeholders = ", ".join([f"({', '.join(['%s'] * len(fields))})"] * len(rows))
+        params = []
+        for key, total, count in rows:
+            for field, value in zip(fields, (*key, total, count)):
+                params.append(field.get_db_prep_save(value, connection))
+        total_column = quote(fields[5].column)
+        count_column = quote(fields[6].column)
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES {placeholders} "
+            f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+            f"{total_column} = {table}.{total_column} + EXCLUDED.{total_column}, "
+            f"{count_column} = {table}.{count_column} + EXCLUDED.{count_column}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def record_expense(expense: Expense, sign: int = 1):
+    delta = RollupDelta()
+    delta.add(expense, sign)
+    delta.apply()
+
+
+def compute_rollups(user) -> dict[tuple, tuple[Decimal, int]]:
+    rollups: dict[tuple, list] = defaultdict(lambda: [Decimal("0.00"), 0])
+    days = (
+        Expense.objects.filter(user=user)
+        .values_list("date", "category__name", "currency")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    for day, category_name, currency, total, count in days.iterator():
+        category_name = category_name or ""
+        for period, start in (
+            (SpendRollup.PERIOD_DAY, day),
+            (SpendRollup.PERIOD_MONTH, day.replace(day=1)),
+        ):
+            rollup = rollups[(period, start, category_name, currency)]
+            rollup[0] += total
+            rollup[1] += count
+    return {key: (total, count) for key, (total, count) in rollups.items()}
+
+
+def rebuild_rollups(user) -> int:
+    expected = compute_rollups(user)
+    current = {
+        (row.period, row.period_start, row.category_name, row.currency): (row.total, row.expense_count)
+        for row in SpendRollup.objects.filter(user=user)
+        if row.total or row.expense_count
+    }
+    drifted = sum(1 for key in expected.keys() | current.keys() if expected.get(key) != current.get(key))
+    if drifted:
+        SpendRollup.objects.filter(user=user).delete()
+        SpendRollup.objects.bulk_create(
+            [
+                SpendRollup(
+                    user=user,
+                    period=period,
+                    period_start=start,
+                    category_name=category_name,
+                    currency=currency,
+                    total=total,
+                    expense_count=count,
+                )
+                for (period, start, category_name, currency), (total, count) in expected.items()
+            ],
+            batch_size=1000,
+        )
+        invalidate_user_responses(user)
+    return drifted
@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from ..models import WhatsAppUser
+
+# Columns another worker may have changed since this process cached the user
+# row. They are re-read by the lock query itself, so handlers never act on a
+# stale default currency or reply generation, and neither costs an extra query.
+_LOCKED_FIELDS = ("locale", "timezone", "default_currency", "reply_generation")
+
+
+@contextmanager
+def serialized_for_user(user: WhatsAppUser):
+    # Holding the user's row lock for the whole transaction serializes every
+    # write path for that user (balance adjustments, loan payments) across
+    # threads and processes, while other users proceed in parallel. Arrival
+    # order comes from the inbound queue: each user belongs to one worker's
+    # shard, and that worker handles its messages by id.
+    with transaction.atomic():
+        rows = WhatsAppUser.objects.select_for_update().filter(pk=user.pk).values_list(*_LOCKED_FIELDS)
+        for row in rows:
+            for attname, value in zip(_LOCKED_FIELDS, row):
+                setattr(user, attname, value)
+        yield
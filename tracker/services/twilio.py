@@ -1,14 +1,224 @@
+import asyncio
 import base64
 import hashlib
 import hmac
 import logging
+import os
+import threading
+import time
+
+from aiohttp import ClientConnectorError, ClientSession, ClientTimeout, TCPConnector
+from aiohttp_retry import ExponentialRetry, RetryClient
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 from django.conf import settings
 
+from .metrics import TWILIO_SEND_FAILURES, TWILIO_SEND_LATENCY
+
 logger = logging.getLogger(__name__)
 
 
+class TransportStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections_opened = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(self.requests - self.connections_opened, 0),
+            }
+
+
+transport_stats = TransportStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        transport_stats.record_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        transport_stats.record_connection()
+        return super()._new_conn()
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        transport_stats.record_request()
+        return super().send(request, *args, **kwargs)
+
+
+_client_lock = threading.Lock()
+_client: Client | None = None
+_client_pid: int | None = None
+
+
+def _build_client() -> Client:
+    http_client = TwilioHttpClient(pool_connections=True)
+    http_client.timeout = (
+        settings.TWILIO_HTTP_CONNECT_TIMEOUT,
+        settings.TWILIO_HTTP_READ_TIMEOUT,
+    )
+    adapter = _PooledHTTPAdapter(
+        pool_maxsize=settings.TWILIO_HTTP_POOL_SIZE,
+        max_retries=settings.TWILIO_HTTP_MAX_RETRIES,
+    )
+    http_client.session.mount("https://", adapter)
+    http_client.session.mount("http://", adapter)
+    client = Client(
+        settings.TWILIO_ACCOUNT_SID,
+        settings.TWILIO_AUTH_TOKEN,
+        http_client=http_client,
+    )
+    if settings.TWILIO_API_BASE_URL:
+        client.api.base_url = settings.TWILIO_API_BASE_URL
+    return client
+
+
+def get_twilio_client() -> Client:
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client()
+                _client_pid = pid
+    return _client
+
+
+def reset_twilio_client():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.http_client.session.close()
+        _client = None
+        _client_pid = None
+
+
+class _DefaultTimeoutSession:
+    # The Twilio async client passes timeout=None on every request, which
+    # aiohttp reads as "no timeout"; this applies the configured one instead.
+    def __init__(self, session, timeout: ClientTimeout):
+        self._session = session
+        self._timeout = timeout
+
+    def request(self, *args, timeout=None, **kwargs):
+        return self._session.request(*args, timeout=timeout or self._timeout, **kwargs)
+
+    async def close(self):
+        await self._session.close()
+
+
+def _build_async_client() -> Client:
+    session = ClientSession(connector=TCPConnector(limit=settings.TWILIO_HTTP_POOL_SIZE))
+    if settings.TWILIO_HTTP_MAX_RETRIES:
+        # Like the sync adapter, only failures to connect are retried, so a
+        # message is never sent twice.
+        session = RetryClient(
+            client_session=session,
+            retry_options=ExponentialRetry(
+                attempts=settings.TWILIO_HTTP_MAX_RETRIES + 1,
+                exceptions={ClientConnectorError},
+                retry_all_server_errors=False,
+            ),
+        )
+    http_client = AsyncTwilioHttpClient(pool_connections=False)
+    http_client.session = _DefaultTimeoutSession(
+        session,
+        ClientTimeout(
+            sock_connect=settings.TWILIO_HTTP_CONNECT_TIMEOUT,
+            sock_read=settings.TWILIO_HTTP_READ_TIMEOUT,
+        ),
+    )
+    client = Client(
+        settings.TWILIO_ACCOUNT_SID,
+        settings.TWILIO_AUTH_TOKEN,
+        http_client=http_client,
+    )
+    if settings.TWILIO_API_BASE_URL:
+        client.api.base_url = settings.TWILIO_API_BASE_URL
+    return client
+
+
+_async_client: Client | None = None
+_async_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def start_async_twilio_client():
+    # Called from the ASGI lifespan startup: the worker's event loop lives as
+    # long as the process, so a session bound to it can be kept and is closed
+    # by aclose_twilio_client at shutdown.
+    global _async_client_loop
+    _async_client_loop = asyncio.get_running_loop()
+
+
+def get_async_twilio_client() -> Client | None:
+    # aiohttp sessions belong to the loop that created them. Any loop other
+    # than the lifespan's (an async view served over WSGI runs each request
+    # in a fresh one) gets None, and callers use the pooled sync client, so no
+    # session is ever left behind on a finished loop.
+    global _async_client
+    if _async_client_loop is None or asyncio.get_running_loop() is not _async_client_loop:
+        return None
+    if _async_client is None:
+        _async_client = _build_async_client()
+    return _async_client
+
+
+async def aclose_twilio_client():
+    global _async_client, _async_client_loop
+    client = _async_client
+    _async_client = None
+    _async_client_loop = None
+    if client is not None:
+        await client.http_client.close()
+
+
+def _forget_client_after_fork():
+    # Sockets inherited from the parent must not be shared with it, so the
+    # child drops the clients without closing them and builds its own.
+    global _client, _client_lock, _client_pid, _async_client, _async_client_loop
+    _client_lock = threading.Lock()
+    _client = None
+    _client_pid = None
+    _async_client = None
+    _async_client_loop = None
+
+
+os.register_at_fork(after_in_child=_forget_client_after_fork)
+
+
 def is_twilio_configured() -> bool:
     return bool(settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN and settings.TWILIO_WHATSAPP_FROM)
 
@@ -35,17 +245,38 @@ def validate_twilio_request(request) -> bool:
     return hmac.compare_digest(computed, signature)
 
 
-def send_whatsapp_message(to_number: str, body: str) -> None:
-    print(to_number, body)
-    client = Client(
-        settings.TWILIO_ACCOUNT_SID,
-        settings.TWILIO_AUTH_TOKEN,
-    )
+def send_whatsapp_message(to_number: str, body: str) -> str:
+    start = time.perf_counter()
+    try:
+        message = get_twilio_client().messages.create(
+            from_=settings.TWILIO_WHATSAPP_FROM,   # "whatsapp:+14155238886"
+            to=to_number,                          # "whatsapp:+94710170677"
+            body=body,
+        )
+    except Exception:
+        TWILIO_SEND_FAILURES.inc()
+        raise
+    finally:
+        TWILIO_SEND_LATENCY.observe(time.perf_counter() - start)
+    logger.info("Sent WhatsApp message %s", message.sid)
+    return message.sid
 
-    message =  client.messages.create(
-        from_=settings.TWILIO_WHATSAPP_FROM,   # "whatsapp:+14155238886"
-        to=to_number,                          # "whatsapp:+94710170677"
-        body=body,
-    )
 
-    print(message.sid)
+async def asend_whatsapp_message(to_number: str, body: str) -> str:
+    client = get_async_twilio_client()
+    if client is None:
+        return await sync_to_async(send_whatsapp_message, thread_sensitive=False)(to_number, body)
+    start = time.perf_counter()
+    try:
+        message = await client.messages.create_async(
+            from_=settings.TWILIO_WHATSAPP_FROM,
+            to=to_number,
+            body=body,
+        )
+    except Exception:
+        TWILIO_SEND_FAILURES.inc()
+        raise
+    finally:
+        TWILIO_SEND_LATENCY.observe(time.perf_counter() - start)
+    logger.info("Sent WhatsApp message %s", message.sid)
+    return message.sid
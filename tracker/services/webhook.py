@@ -1,20 +1,111 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
 from .errors import ValidationError
+from .ttl_cache import TTLCache
 from ..models import Message, WhatsAppUser
 
+_recent_keys: TTLCache | None = None
+_user_cache: TTLCache | None = None
+_USER_FIELDS = [field.attname for field in WhatsAppUser._meta.concrete_fields]
+
+
+def get_recent_keys() -> TTLCache:
+    global _recent_keys
+    if _recent_keys is None:
+        _recent_keys = TTLCache(
+            maxsize=getattr(settings, "IDEMPOTENCY_CACHE_SIZE", 10000),
+            ttl=getattr(settings, "IDEMPOTENCY_CACHE_TTL_SECONDS", 600),
+        )
+    return _recent_keys
+
+
+def get_user_cache() -> TTLCache:
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = TTLCache(
+            maxsize=getattr(settings, "USER_CACHE_SIZE", 10000),
+            ttl=getattr(settings, "USER_CACHE_TTL_SECONDS", 60),
+        )
+    return _user_cache
+
+
+def _cache_user(user: WhatsAppUser):
+    values = tuple(getattr(user, attname) for attname in _USER_FIELDS)
+    get_user_cache().set(user.phone_number, (user._state.db, values))
+
+
+def _cached_user(phone_number: str) -> WhatsAppUser | None:
+    entry = get_user_cache().get(phone_number)
+    if entry is None:
+        return None
+    # Every caller gets its own instance so handlers can modify and save it
+    # without touching objects held by other threads.
+    db, values = entry
+    return WhatsAppUser.from_db(db, _USER_FIELDS, values)
+
+
+@receiver(post_save, sender=WhatsAppUser)
+@receiver(post_delete, sender=WhatsAppUser)
+def invalidate_cached_user(sender, instance: WhatsAppUser, **kwargs):
+    get_user_cache().delete(instance.phone_number)
+
 
 def get_or_create_user(phone_number: str) -> WhatsAppUser:
-    user, _created = WhatsAppUser.objects.get_or_create(phone_number=phone_number)
+    user = _cached_user(phone_number)
+    if user is None:
+        user, _created = WhatsAppUser.objects.get_or_create(phone_number=phone_number)
+        _cache_user(user)
     return user
 
 
-def ensure_message(user: WhatsAppUser, raw_text: str, idempotency_key: str) -> Message:
-    if Message.objects.filter(idempotency_key=idempotency_key).exists():
-        raise ValidationError("Duplicate message ignored.")
-    return Message.objects.create(
+def _insert_message(user: WhatsAppUser, raw_text: str, idempotency_key: str) -> Message | None:
+    # One INSERT ... ON CONFLICT DO NOTHING RETURNING statement: concurrent
+    # retries of the same message cannot both pass an exists() check and then
+    # trip over the unique constraint.
+    message = Message(
         user=user,
         raw_text=raw_text,
         idempotency_key=idempotency_key,
+        created_at=timezone.now(),
     )
+    meta = Message._meta
+    quote = connection.ops.quote_name
+    fields = [
+        meta.get_field(name)
+        for name in ("user", "raw_text", "parsed_intent", "status", "idempotency_key", "created_at")
+    ]
+    columns = ", ".join(quote(field.column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    values = [field.get_db_prep_save(field.pre_save(message, True), connection) for field in fields]
+    sql = (
+        f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES ({placeholders}) "
+        f"ON CONFLICT ({quote(meta.get_field('idempotency_key').column)}) DO NOTHING "
+        f"RETURNING {quote(meta.pk.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, values)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    message.pk = row[0]
+    message._state.adding = False
+    return message
+
+
+def ensure_message(user: WhatsAppUser, raw_text: str, idempotency_key: str) -> Message:
+    recent_keys = get_recent_keys()
+    if idempotency_key in recent_keys:
+        raise ValidationError("Duplicate message ignored.")
+    message = _insert_message(user, raw_text, idempotency_key)
+    recent_keys.set(idempotency_key, True)
+    if message is None:
+        raise ValidationError("Duplicate message ignored.")
+    return message
 
 
 def mark_message(message: Message, status: str, intent: str | None = None):
@@ -24,3 +115,24 @@ def mark_message(message: Message, status: str, intent: str | None = None):
         message.parsed_intent = intent
         fields.append("parsed_intent")
     message.save(update_fields=fields)
+
+
+async def aget_or_create_user(phone_number: str) -> WhatsAppUser:
+    user = _cached_user(phone_number)
+    if user is None:
+        user, _created = await WhatsAppUser.objects.aget_or_create(phone_number=phone_number)
+        _cache_user(user)
+    return user
+
+
+async def aensure_message(user: WhatsAppUser, raw_text: str, idempotency_key: str) -> Message:
+    return await sync_to_async(ensure_message)(user, raw_text, idempotency_key)
+
+
+async def amark_message(message: Message, status: str, intent: str | None = None):
+    fields = ["status"]
+    message.status = status
+    if intent is not None:
+        message.parsed_intent = intent
+        fields.append("parsed_intent")
+    await message.asave(update_fields=fields)
@@ -1,3 +1,1289 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import close_old_connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from core import gunicorn_hooks
+
+from .management.commands.bench_parser import build_corpus
+from .management.commands.bench_twilio import _FakeTwilioHandler
+from .models import Account, Expense, ImportJob, Loan, Message, OutboundMessage, SpendRollup, WhatsAppUser
+from .services import commands
+from .services import help as help_service
+from .services import rate_limit, regex_parser, twilio
+from .services.analytics import compute_insights
+from .services.exports import EXPORT_COLUMNS
+from .services.handlers import handle_intent
+from .services.imports import import_expenses
+from .services.inbound import claim_and_process
+from .services.intent_router import route_intent
+from .services.outbound import claim_messages, enqueue_message, process_batch
+from .services.parse_cache import ParseCache
+from .services.regex_parser import PATTERNS, _build_match, parse_normalized, preprocess_message
+from .services.reporting import shift_month
+from .services.response_cache import invalidate_user_responses
+from .services.rollups import rebuild_rollups
+from .services.scheduler import serialized_for_user
+from .services.validation import validate_payload
+from .services.webhook import get_or_create_user, get_recent_keys, get_user_cache
+
+
+def _spec_examples() -> list[str]:
+    spec = (settings.BASE_DIR / "REGEX_SPEC.md").read_text(encoding="utf-8")
+    return re.findall(r"^### Example\n(.+)$", spec, flags=re.MULTILINE)
+
+
+def _help_examples() -> list[str]:
+    sections = [help_service._GENERAL_HELP, *help_service._TOPICAL_HELP.values()]
+    return [line[2:] for lines in sections for line in lines if line.startswith("- ")]
+
+
+def _full_scan(normalized: str):
+    matches = []
+    for spec in PATTERNS:
+        match = spec["pattern"].match(normalized)
+        if match:
+            matches.append(_build_match(spec, match.groupdict()))
+    return matches
+
+
+class DispatchIndexDifferentialTests(SimpleTestCase):
+    near_misses = [
+        "",
+        "hello",
+        "spent 0 on tea from wallet",
+        "spent 200 on tea from wallet cash on 2024-01-01 extra",
+        "update currency",
+        "set default currency to usd",
+        "balance of hdfc card last4 12",
+        "show expenses for smarch",
+        "list accounts please",
+    ]
+
+    def assertIndexAgrees(self, text: str):
+        # The first-word index must never drop a pattern a full scan matches.
+        normalized = preprocess_message(text)
+        self.assertEqual(parse_normalized(normalized), _full_scan(normalized), msg=text)
+
+    def test_regex_spec_examples(self):
+        examples = _spec_examples()
+        self.assertGreater(len(examples), 0)
+        for text in examples:
+            with self.subTest(text=text):
+                self.assertIndexAgrees(text)
+                self.assertTrue(parse_normalized(preprocess_message(text)))
+
+    def test_help_examples(self):
+        for text in _help_examples():
+            with self.subTest(text=text):
+                self.assertIndexAgrees(text)
+
+    def test_near_misses(self):
+        for text in self.near_misses:
+            with self.subTest(text=text):
+                self.assertIndexAgrees(text)
+
+    def test_falls_back_to_full_scan_without_sre_internals(self):
+        with mock.patch.object(regex_parser, "sre_parse", None):
+            index, unindexed = regex_parser.build_dispatch_index(PATTERNS)
+        self.assertEqual(index, {})
+        self.assertEqual(unindexed, tuple(PATTERNS))
+
+
+def _parse_or_error(parse, normalized: str):
+    try:
+        return parse(normalized)
+    except ValueError as error:
+        return str(error)
+
+
+class ParserEngineDifferentialTests(SimpleTestCase):
+    def assertEnginesAgree(self, text: str):
+        normalized = preprocess_message(text)
+        self.assertEqual(
+            _parse_or_error(regex_parser.parse_combined, normalized),
+            _parse_or_error(parse_normalized, normalized),
+            msg=text,
+        )
+
+    def test_regex_spec_and_help_examples(self):
+        for text in [*_spec_examples(), *_help_examples(), *DispatchIndexDifferentialTests.near_misses]:
+            with self.subTest(text=text):
+                self.assertEnginesAgree(text)
+
+    def test_benchmark_corpus(self):
+        for messages in build_corpus(200, seed=3).values():
+            for text in messages:
+                with self.subTest(text=text):
+                    self.assertEnginesAgree(text)
+
+    def test_reports_every_matching_branch(self):
+        specs = tuple(
+            {"name": name, "intent": "HELP", "command": commands.Help, "pattern": re.compile(pattern)}
+            for name, pattern in [
+                ("first", r"^help(?: (?P<help_topic>[a-z]+))?$"),
+                ("other", r"^cards$"),
+                ("second", r"^help (?P<help_topic>cards)$"),
+            ]
+        )
+        matcher = regex_parser.CombinedMatcher(specs)
+        self.assertEqual([match.pattern_name for match in matcher.parse("help cards")], ["first", "second"])
+        self.assertEqual(matcher.parse("help cards")[1].command, commands.Help(help_topic="cards"))
+        self.assertEqual([match.pattern_name for match in matcher.parse("help")], ["first"])
+        self.assertEqual(matcher.parse("help me now"), [])
+
+    def test_setting_selects_engine(self):
+        self.assertIs(regex_parser.get_parser_engine(), parse_normalized)
+        with override_settings(PARSER_ENGINE="combined"):
+            self.assertIs(regex_parser.get_parser_engine(), regex_parser.parse_combined)
+        with override_settings(PARSER_ENGINE="dfa"):
+            with self.assertRaisesMessage(ValueError, "Unknown parser engine: dfa"):
+                regex_parser.get_parser_engine()
+
+
+class ParseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.parsed = []
+        self.today = date(2026, 3, 31)
+        patcher = mock.patch("tracker.services.parse_cache.timezone.localdate", side_effect=lambda: self.today)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def parse(self, normalized: str) -> list:
+        self.parsed.append(normalized)
+        return [(normalized, self.today)]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ParseCache(maxsize=2)
+        cache.get_or_parse("a", self.parse)
+        cache.get_or_parse("b", self.parse)
+        cache.get_or_parse("a", self.parse)
+        cache.get_or_parse("c", self.parse)
+        self.assertEqual(self.parsed, ["a", "b", "c"])
+        # "a" was used after "b", so "b" went.
+        cache.get_or_parse("a", self.parse)
+        cache.get_or_parse("b", self.parse)
+        self.assertEqual(self.parsed, ["a", "b", "c", "b"])
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2})
+
+    def test_hits_return_the_cached_result(self):
+        cache = ParseCache(maxsize=10)
+        first = cache.get_or_parse("spent 10 on tea from sbi account", self.parse)
+        second = cache.get_or_parse("spent 10 on tea from sbi account", self.parse)
+        self.assertIs(second, first)
+        self.assertEqual(len(self.parsed), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 10})
+
+    def test_entries_are_flushed_when_the_local_day_changes(self):
+        cache = ParseCache(maxsize=10)
+        cache.get_or_parse("a", self.parse)
+        cache.get_or_parse("b", self.parse)
+        self.today = date(2026, 4, 1)
+        self.assertEqual(cache.get_or_parse("a", self.parse), (("a", date(2026, 4, 1)),))
+        self.assertEqual(self.parsed, ["a", "b", "a"])
+        self.assertEqual(cache.stats()["size"], 1)
+        self.assertEqual(cache.evictions, 0)
+
+    def test_result_parsed_across_midnight_is_not_cached(self):
+        cache = ParseCache(maxsize=10)
+        cache.get_or_parse("a", self.parse)
+
+        def parse_past_midnight(normalized: str) -> list:
+            self.today = date(2026, 4, 1)
+            cache.get_or_parse("b", self.parse)
+            return self.parse(normalized)
+
+        cache.get_or_parse("c", parse_past_midnight)
+        self.assertNotIn("c", cache._entries)
+        self.assertEqual(list(cache._entries), ["b"])
+
+    def test_zero_size_disables_caching(self):
+        cache = ParseCache(maxsize=0)
+        cache.get_or_parse("a", self.parse)
+        cache.get_or_parse("a", self.parse)
+        self.assertEqual(self.parsed, ["a", "a"])
+        self.assertEqual((cache.hits, cache.misses, cache.stats()["size"]), (0, 0, 0))
+
+
+def _run_message(user: WhatsAppUser, text: str) -> str:
+    intent, command = route_intent(text)
+    with serialized_for_user(user):
+        validate_payload(intent, command, user)
+        return handle_intent(user, intent, command)
+
+
+def _run_in_thread(user: WhatsAppUser, text: str) -> str:
+    try:
+        return _run_message(user, text)
+    finally:
+        close_old_connections()
+
+
+def _queue_message(user: WhatsAppUser, text: str) -> Message:
+    return Message.objects.create(user=user, raw_text=text, idempotency_key=f"{user.pk}:{text}")
+
+
+def _drain_shard(shard: int, shards: int):
+    try:
+        while claim_and_process(5, shard=shard, shards=shards):
+            pass
+    finally:
+        close_old_connections()
+
+
+def _expense_amounts(user: WhatsAppUser) -> list[Decimal]:
+    return list(Expense.objects.filter(user=user).order_by("id").values_list("amount", flat=True))
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class PerUserSerializationStressTests(TransactionTestCase):
+    users = 4
+    rounds = 25
+
+    def setUp(self):
+        self.accounts = []
+        for index in range(self.users):
+            user = WhatsAppUser.objects.create(phone_number=f"+1555000{index:04d}")
+            _run_message(user, "add account sbi account balance 100000")
+            _run_message(user, "add loan home amount 50000")
+            self.accounts.append(user)
+
+    def _interleaved(self) -> list[tuple[WhatsAppUser, str]]:
+        work = []
+        for amount in range(1, self.rounds + 1):
+            for user in self.accounts:
+                work.append((user, f"spent {amount} on food from sbi account"))
+                work.append((user, f"pay loan home amount {amount}"))
+        return work
+
+    def assertExactBalances(self):
+        total = Decimal(sum(range(1, self.rounds + 1)))
+        for user in self.accounts:
+            account = Account.objects.get(user=user, name="sbi")
+            loan = Loan.objects.get(user=user, name="home")
+            self.assertEqual(account.balance, Decimal("100000") - total)
+            self.assertEqual(loan.outstanding_amount, Decimal("50000") - total)
+
+    def test_sharded_inbound_workers(self):
+        for user, text in self._interleaved():
+            _queue_message(user, text)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            for future in [pool.submit(_drain_shard, shard, 3) for shard in range(3)]:
+                future.result()
+        self.assertExactBalances()
+        for user in self.accounts:
+            self.assertEqual(_expense_amounts(user), [Decimal(amount) for amount in range(1, self.rounds + 1)])
+
+    def test_row_lock_across_threads(self):
+        # Without lanes every thread races on the same users, so only the
+        # row lock keeps read-modify-write balance updates from being lost.
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(_run_in_thread, user, text) for user, text in self._interleaved()]
+            for future in futures:
+                future.result()
+        self.assertExactBalances()
+
+
+class InboundShardingTests(TestCase):
+    def test_shard_claims_only_its_users_in_arrival_order(self):
+        users = [WhatsAppUser.objects.create(phone_number=f"+1555100{index:04d}") for index in range(4)]
+        for user in users:
+            _run_message(user, "add account sbi account balance 1000")
+        for amount in (3, 1, 2):
+            for user in users:
+                _queue_message(user, f"spent {amount} on food from sbi account")
+
+        self.assertEqual(claim_and_process(100, shard=0, shards=2), 6)
+        for user in users:
+            expected = [Decimal(3), Decimal(1), Decimal(2)] if user.pk % 2 == 0 else []
+            self.assertEqual(_expense_amounts(user), expected)
+        self.assertEqual(Message.objects.filter(status=Message.STATUS_RECEIVED).count(), 6)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550003333")
+        _run_message(self.user, "add account sbi account balance 1000")
+
+    def test_write_invalidates_cached_read(self):
+        self.assertIn("1000.00", _run_message(self.user, "list accounts"))
+        # The generation comes with the row lock, so the repeat read itself
+        # runs no query.
+        with serialized_for_user(self.user):
+            with self.assertNumQueries(0):
+                handle_intent(self.user, *route_intent("list accounts"))
+        _run_message(self.user, "spent 250 on food from sbi account")
+        self.assertIn("750.00", _run_message(self.user, "list accounts"))
+
+    def test_write_outside_handlers_invalidates_cached_read(self):
+        # Imports, rebuilds and other workers only share the database.
+        self.assertIn("1000.00", _run_message(self.user, "list accounts"))
+        Account.objects.filter(user=self.user).update(balance=Decimal("5"))
+        invalidate_user_responses(WhatsAppUser.objects.get(pk=self.user.pk))
+        self.assertIn("5.00", _run_message(self.user, "list accounts"))
+
+
+class ExpenseWriteQueryTests(TestCase):
+    # Steady state: category, account and card already exist. The counts
+    # include the transaction's SAVEPOINT/RELEASE (BEGIN/COMMIT in production),
+    # the reply-cache generation bump and, for accounts, the balance read-back.
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550001111")
+        _run_message(self.user, "add account sbi account balance 1000")
+        _run_message(self.user, "add card hdfc limit 50000 cycle 5 last4 1234")
+        _run_message(self.user, "spent 1 on food from sbi account")
+        _run_message(self.user, "spent 1 on food from hdfc card last4 1234")
+
+    def handle(self, text: str) -> str:
+        intent, command = route_intent(text)
+        return handle_intent(self.user, intent, command)
+
+    def latest_expense_id(self) -> int:
+        return Expense.objects.filter(user=self.user).latest("id").id
+
+    def test_create_from_account(self):
+        with self.assertNumQueries(9):
+            reply = self.handle("spent 100 on food from sbi account")
+        self.assertIn("balance: 899.00 INR", reply)
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("899.00"))
+
+    def test_create_from_card(self):
+        with self.assertNumQueries(8):
+            reply = self.handle("spent 100 on food from hdfc card last4 1234")
+        self.assertIn("Outstanding on hdfc 1234: 101.00 INR", reply)
+
+    def test_update_same_account(self):
+        expense_id = Expense.objects.filter(user=self.user, source_account__isnull=False).get().id
+        with self.assertNumQueries(8):
+            reply = self.handle(f"update expense {expense_id} amount 50")
+        self.assertIn("balance: 950.00 INR", reply)
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("950.00"))
+
+    def test_delete_restores_balance(self):
+        expense_id = Expense.objects.filter(user=self.user, source_account__isnull=False).get().id
+        with self.assertNumQueries(8):
+            reply = self.handle(f"delete expense {expense_id}")
+        self.assertIn("Restored sbi account balance: 1000.00 INR", reply)
+        self.assertFalse(Expense.objects.filter(id=expense_id).exists())
+
+    def test_failed_write_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.handle("spent 100 on food from sbi account")
+                raise RuntimeError("boom")
+        self.assertEqual(Account.objects.get(user=self.user).balance, Decimal("999.00"))
+
+
+class SpendRollupTests(TestCase):
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550004444")
+        _run_message(self.user, "add account sbi account balance 10000")
+
+    def handle(self, text: str) -> str:
+        intent, command = route_intent(text)
+        return handle_intent(self.user, intent, command)
+
+    def rollups(self, period=SpendRollup.PERIOD_MONTH) -> dict:
+        rows = SpendRollup.objects.filter(user=self.user, period=period).exclude(expense_count=0)
+        return {(row.period_start.isoformat(), row.category_name): (row.total, row.expense_count) for row in rows}
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(rebuild_rollups(self.user), 0)
+
+    def test_create(self):
+        self.handle("spent 100 on food from sbi account on 2026-03-05")
+        self.handle("spent 50 on food from sbi account on 2026-03-05")
+        self.handle("spent 20 on fuel from sbi account on 2026-03-20")
+        self.assertEqual(
+            self.rollups(),
+            {("2026-03-01", "food"): (Decimal("150.00"), 2), ("2026-03-01", "fuel"): (Decimal("20.00"), 1)},
+        )
+        self.assertEqual(
+            self.rollups(SpendRollup.PERIOD_DAY)[("2026-03-05", "food")], (Decimal("150.00"), 2)
+        )
+        self.assertMatchesRebuild()
+
+    def test_update_amount_category_and_month(self):
+        self.handle("spent 100 on food from sbi account on 2026-03-05")
+        expense_id = Expense.objects.get(user=self.user).id
+        self.handle(f"update expense {expense_id} amount 80")
+        self.assertEqual(self.rollups(), {("2026-03-01", "food"): (Decimal("80.00"), 1)})
+        self.handle(f"update expense {expense_id} amount 80 category rent on 2026-04-01")
+        self.assertEqual(self.rollups(), {("2026-04-01", "rent"): (Decimal("80.00"), 1)})
+        self.assertEqual(set(self.rollups(SpendRollup.PERIOD_DAY)), {("2026-04-01", "rent")})
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        self.handle("spent 100 on food from sbi account on 2026-03-05")
+        self.handle("spent 30 on food from sbi account on 2026-03-06")
+        expense_id = Expense.objects.filter(user=self.user).earliest("id").id
+        self.handle(f"delete expense {expense_id}")
+        self.assertEqual(self.rollups(), {("2026-03-01", "food"): (Decimal("30.00"), 1)})
+        self.assertNotIn(("2026-03-05", "food"), self.rollups(SpendRollup.PERIOD_DAY))
+        self.assertMatchesRebuild()
+
+    def test_import_batch(self):
+        stats = import_expenses(
+            self.user,
+            [
+                "date,amount,category,source,source_type\n",
+                "2026-03-05,10,food,sbi,account\n",
+                "2026-03-06,15,food,sbi,account\n",
+                "2026-04-02,5,tea,wallet,cash\n",
+            ],
+            batch_size=2,
+        )
+        self.assertEqual(stats.imported, 3)
+        self.assertEqual(
+            self.rollups(),
+            {("2026-03-01", "food"): (Decimal("25.00"), 2), ("2026-04-01", "tea"): (Decimal("5.00"), 1)},
+        )
+        self.assertMatchesRebuild()
+
+    def test_rebuild_repairs_drift(self):
+        self.handle("spent 100 on food from sbi account on 2026-03-05")
+        SpendRollup.objects.filter(user=self.user, period=SpendRollup.PERIOD_MONTH).update(total=Decimal("1"))
+        SpendRollup.objects.filter(user=self.user, period=SpendRollup.PERIOD_DAY).delete()
+        self.assertEqual(rebuild_rollups(self.user), 2)
+        self.assertEqual(self.rollups(), {("2026-03-01", "food"): (Decimal("100.00"), 1)})
+        self.assertMatchesRebuild()
+
+
+class TransactionPagingTests(TestCase):
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550005555")
+        _run_message(self.user, "add account sbi account balance 100000")
+        _run_message(self.user, "add card hdfc limit 50000 cycle 5 last4 1234")
+        self.amount = 0
+
+    def spend(self, count: int, text: str) -> list[int]:
+        # Distinct amounts keep the duplicate check out of the way.
+        for _ in range(count):
+            self.amount += 1
+            _run_message(self.user, f"spent {self.amount} {text}")
+        return list(Expense.objects.filter(user=self.user).order_by("-id").values_list("id", flat=True)[:count])
+
+    def listed(self, text: str) -> tuple[list[int], str]:
+        reply = _run_message(self.user, text)
+        return [int(expense_id) for expense_id in re.findall(r"#(\d+)", reply)], reply
+
+    def test_pages_walk_equal_timestamps_without_gaps(self):
+        self.spend(25, "on food from sbi account on 2026-03-05")
+        Expense.objects.filter(user=self.user).update(created_at=Expense.objects.earliest("id").created_at)
+        expected = list(Expense.objects.filter(user=self.user).order_by("-id").values_list("id", flat=True))
+
+        seen = []
+        page, reply = self.listed("list transactions")
+        self.assertIn("Send 'more transactions' for older entries.", reply)
+        seen += page
+        page, reply = self.listed("more transactions")
+        seen += page
+        page, reply = self.listed("more transactions")
+        self.assertNotIn("more transactions", reply)
+        seen += page
+        self.assertEqual([len(part) for part in (seen[:10], seen[10:20], seen[20:])], [10, 10, 5])
+        self.assertEqual(seen, expected)
+        self.assertEqual(
+            _run_message(self.user, "more transactions"),
+            "No more transactions. Send 'list transactions' to start again.",
+        )
+
+    def test_keyset_orders_by_date_then_id(self):
+        late = self.spend(2, "on food from sbi account on 2026-03-07")
+        early = self.spend(2, "on food from sbi account on 2026-03-01")
+        middle = self.spend(2, "on food from sbi account on 2026-03-05")
+        self.assertEqual(self.listed("list transactions")[0], late + middle + early)
+        self.assertEqual(self.listed(f"transactions before {middle[0]}")[0], middle[1:] + early)
+        self.assertEqual(self.listed(f"more transactions before {late[1]}")[0], middle + early)
+
+    def test_category_filter_is_kept_across_pages(self):
+        food = self.spend(12, "on food from sbi account on 2026-03-05")
+        self.spend(3, "on fuel from sbi account on 2026-03-05")
+        first, _ = self.listed("list transactions category food")
+        second, reply = self.listed("more transactions")
+        self.assertEqual(first + second, food)
+        self.assertNotIn("more transactions", reply)
+
+    def test_source_filter(self):
+        card = self.spend(2, "on food from hdfc card last4 1234 on 2026-03-05")
+        account = self.spend(2, "on food from sbi account on 2026-03-05")
+        self.assertEqual(self.listed("show transactions from hdfc card")[0], card)
+        self.assertEqual(self.listed("show transactions from sbi account")[0], account)
+
+    def test_between_filter_is_inclusive_and_kept_across_pages(self):
+        self.spend(1, "on food from sbi account on 2026-02-28")
+        inside = self.spend(11, "on food from sbi account on 2026-03-01")
+        inside = self.spend(1, "on food from sbi account on 2026-03-31") + inside
+        self.spend(1, "on food from sbi account on 2026-04-01")
+        first, _ = self.listed("list transactions between 2026-03-01 and 2026-03-31")
+        second, _ = self.listed("more transactions")
+        self.assertEqual(first + second, inside)
+
+
+class SummaryReportTests(TestCase):
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550004545")
+        other = WhatsAppUser.objects.create(phone_number="+15550004546")
+        month = SpendRollup.PERIOD_MONTH
+        for user, period_start, category_name, currency, total in [
+            (self.user, date(2026, 3, 1), "food", "inr", "300"),
+            (self.user, date(2026, 3, 1), "fuel", "inr", "100"),
+            (self.user, date(2026, 3, 1), "food", "usd", "20"),
+            (self.user, date(2026, 2, 1), "food", "inr", "200"),
+            (self.user, date(2026, 2, 1), "rent", "inr", "500"),
+            # Left behind when February's only tea expense was deleted.
+            (self.user, date(2026, 2, 1), "tea", "inr", "0"),
+            (self.user, date(2025, 12, 1), "tea", "inr", "30"),
+            (other, date(2026, 3, 1), "food", "inr", "999"),
+        ]:
+            SpendRollup.objects.create(
+                user=user,
+                period=month,
+                period_start=period_start,
+                category_name=category_name,
+                currency=currency,
+                total=Decimal(total),
+                expense_count=1 if Decimal(total) else 0,
+            )
+        # Primary keys are reused between tests; a fresh generation keeps
+        # another test's cached replies out.
+        invalidate_user_responses(self.user)
+        patcher = mock.patch("django.utils.timezone.localdate", return_value=date(2026, 3, 15))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_summary_by_category(self):
+        self.assertEqual(
+            _run_message(self.user, "summary by category for march 2026"),
+            "Expenses by category for March 2026:\n"
+            "- food: 300.00 INR (75%)\n"
+            "- fuel: 100.00 INR (25%)\n"
+            "- food: 20.00 USD (100%)\n"
+            "Total: 400.00 INR + 20.00 USD",
+        )
+        self.assertEqual(
+            _run_message(self.user, "summary by category last month"),
+            "Expenses by category for February 2026:\n"
+            "- rent: 500.00 INR (71%)\n"
+            "- food: 200.00 INR (29%)\n"
+            "Total: 700.00 INR",
+        )
+        self.assertEqual(
+            _run_message(self.user, "summary by category for january"),
+            "No expenses recorded for January 2026.",
+        )
+
+    def test_compare_months(self):
+        self.assertEqual(
+            _run_message(self.user, "compare this month vs last month"),
+            "This month: 400.00 INR + 20.00 USD\n"
+            "Last month: 700.00 INR\n"
+            "Change: -300.00 INR (-43%), +20.00 USD\n"
+            "By category:\n"
+            "- rent: -500.00 INR\n"
+            "- food: +100.00 INR\n"
+            "- fuel: +100.00 INR\n"
+            "- food: +20.00 USD",
+        )
+
+    def test_compare_months_without_spending(self):
+        SpendRollup.objects.filter(user=self.user).delete()
+        self.assertEqual(
+            _run_message(self.user, "compare this month vs last month"),
+            "This month: 0.00 INR\nLast month: 0.00 INR\nChange: +0.00 INR",
+        )
+
+    def test_spending_trend(self):
+        reply = _run_message(self.user, "spending trend")
+        self.assertEqual(
+            reply.splitlines(),
+            [
+                "Spending over the last 12 months:",
+                "- Apr 2025: 0.00 INR",
+                "- May 2025: 0.00 INR",
+                "- Jun 2025: 0.00 INR",
+                "- Jul 2025: 0.00 INR",
+                "- Aug 2025: 0.00 INR",
+                "- Sep 2025: 0.00 INR",
+                "- Oct 2025: 0.00 INR",
+                "- Nov 2025: 0.00 INR",
+                "- Dec 2025: 30.00 INR",
+                "- Jan 2026: 0.00 INR",
+                "- Feb 2026: 700.00 INR",
+                "- Mar 2026: 400.00 INR + 20.00 USD",
+                "Average: 94.17 INR + 1.67 USD per month",
+            ],
+        )
+
+    def test_reports_follow_the_default_currency(self):
+        _run_message(self.user, "set currency usd")
+        self.assertTrue(
+            _run_message(self.user, "summary by category for march 2026").endswith("Total: 20.00 USD + 400.00 INR")
+        )
+
+
+class InsightsTests(TestCase):
+    today = date(2026, 3, 15)
+
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550005656")
+        invalidate_user_responses(self.user)
+        _run_message(self.user, "add account sbi account balance 100000")
+        for text in [
+            "spent 120 on food from sbi account on 2025-11-03",
+            "spent 80 on fuel from sbi account on 2025-11-20",
+            "spent 90 on food from sbi account on 2025-12-10",
+            "spent 400 on rent from sbi account on 2025-12-01",
+            "spent 60 on food from sbi account on 2026-01-31",
+            "spent 410 on rent from sbi account on 2026-02-01",
+            "spent 35 on food from sbi account on 2026-02-15",
+            "spent 20 on food from sbi account on 2026-02-16",
+            "spent 75 on food from sbi account on 2026-03-02",
+            "spent 30 on fuel from sbi account on 2026-03-15",
+            "spent 45 on tea from sbi account on 2026-03-20",
+            "spent 500 usd on food from sbi account on 2026-03-03",
+            "spent 999 on food from sbi account on 2025-10-31",
+        ]:
+            _run_message(self.user, text)
+        # Edits and deletes go through the rollups too.
+        expenses = Expense.objects.filter(user=self.user)
+        _run_message(self.user, f"update expense {expenses.get(amount=20).id} amount 25")
+        _run_message(self.user, f"delete expense {expenses.get(amount=60).id}")
+
+    def expense_total(self, **filters) -> Decimal:
+        return (
+            Expense.objects.filter(user=self.user, currency="inr", **filters).aggregate(total=Sum("amount"))["total"]
+            or Decimal("0.00")
+        )
+
+    def test_matches_a_direct_aggregation_over_expenses(self):
+        insights = compute_insights(self.user, today=self.today)
+        months = [shift_month(date(2026, 3, 1), offset) for offset in range(-4, 1)]
+        self.assertEqual(insights.months, months)
+        self.assertEqual(
+            insights.monthly_totals,
+            [self.expense_total(date__gte=month, date__lt=shift_month(month, 1)) for month in months],
+        )
+
+        window = (months[1], months[4])
+        expected_averages = []
+        for name in Expense.objects.filter(user=self.user).values_list("category__name", flat=True).distinct():
+            average = self.expense_total(category__name=name, date__gte=window[0], date__lt=window[1]) / 3
+            current = self.expense_total(category__name=name, date__gte=months[4])
+            if average or current:
+                expected_averages.append((name, average, current))
+        expected_averages.sort(key=lambda item: (-item[1], item[0]))
+        self.assertEqual(insights.category_averages, expected_averages)
+
+        self.assertEqual(insights.month_to_date, self.expense_total(date__gte=months[4], date__lte=self.today))
+        self.assertEqual(
+            insights.last_month_to_date, self.expense_total(date__gte=months[3], date__lte=date(2026, 2, 15))
+        )
+        self.assertEqual((insights.days_elapsed, insights.days_in_month), (15, 31))
+
+    def test_reply_renders_the_aggregates(self):
+        with mock.patch("django.utils.timezone.localdate", return_value=self.today):
+            reply = _run_message(self.user, "show spending insights")
+        self.assertEqual(
+            reply,
+            "3-month moving average by category:\n"
+            "- rent: 270.00 INR/month, 0.00 so far this month\n"
+            "- food: 50.00 INR/month, 75.00 so far this month\n"
+            "- fuel: 0.00 INR/month, 30.00 so far this month\n"
+            "- tea: 0.00 INR/month, 45.00 so far this month\n"
+            "\n"
+            "Month-over-month growth:\n"
+            "- Dec 2025: 490.00 INR (+145%)\n"
+            "- Jan 2026: 0.00 INR (-100%)\n"
+            "- Feb 2026: 470.00 INR (n/a)\n"
+            "\n"
+            "This month so far: 105.00 INR over 15 day(s)\n"
+            "Spend velocity: 7.00 INR/day\n"
+            "Same point last month: 445.00 INR (-76%)\n"
+            "Projected month-end total: 217.00 INR",
+        )
+
+
+@override_settings(
+    RATE_LIMIT_BACKEND="local",
+    RATE_LIMIT_WRITE_BURST=3,
+    RATE_LIMIT_WRITE_PER_MINUTE=0.0001,
+)
+class WebhookRateLimitTests(TestCase):
+    def setUp(self):
+        rate_limit._backend = None
+        self.addCleanup(setattr, rate_limit, "_backend", None)
+        _run_message(WhatsAppUser.objects.create(phone_number="+15550002222"), "add account sbi account balance 1000")
+
+    def post(self, body: str, message_id: str):
+        return self.client.post(
+            "/webhook/whatsapp/",
+            {"From": "+15550002222", "Body": body, "MessageSid": message_id, "demo": "1"},
+        )
+
+    def test_invalid_date_gets_json_error(self):
+        response = self.post("spent 100 on tea from sbi account on 2024-02-30", "bad-date")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["status"], "error")
+
+    def test_batch_costs_one_token_per_write_line(self):
+        batch = "\n".join(f"spent {amount} on tea from sbi account" for amount in (1, 2))
+        self.assertEqual(rate_limit.intent_class(batch), ("write", 2))
+        self.assertEqual(self.post(batch, "batch").status_code, 200)
+        self.assertEqual(self.post("spent 3 on tea from sbi account", "single").status_code, 200)
+        self.assertEqual(self.post("spent 4 on tea from sbi account", "over").status_code, 429)
+
+
+class AsyncWebhookParityTests(TestCase):
+    # (MessageSid suffix, body); the last entry redelivers the third message.
+    script = [
+        (1, "add account sbi account balance 1000"),
+        (2, "add card hdfc limit 50000 cycle 5 last4 1234"),
+        (3, "spent 100 on food from sbi account on 2026-03-05"),
+        (4, "spent 40 on fuel from hdfc card last4 1234 on 2026-03-06"),
+        (5, "spent 5 on tea from sbi account on 2026-03-07\nspent 6 on tea from sbi account on 2026-03-07"),
+        (6, "spent 5 on tea from sbi account on 2026-03-07"),
+        (7, "not a command"),
+        (8, "show accounts"),
+        (9, "summary expenses for march 2026"),
+        (10, "list transactions"),
+        (3, "spent 100 on food from sbi account on 2026-03-05"),
+    ]
+
+    def setUp(self):
+        get_recent_keys().clear()
+        self.addCleanup(get_recent_keys().clear)
+
+    def run_script(self, post, url: str, phone_number: str) -> list[tuple[int, dict]]:
+        responses = []
+        for suffix, body in self.script:
+            response = post(
+                url, {"From": phone_number, "Body": body, "MessageSid": f"SM{phone_number}-{suffix}", "demo": "1"}
+            )
+            payload = response.json()
+            # Expense ids differ between the two users' ledgers.
+            payload["message"] = re.sub(r"#\d+", "#N", payload["message"])
+            responses.append((response.status_code, payload))
+        return responses
+
+    def ledger(self, phone_number: str) -> dict:
+        user = WhatsAppUser.objects.get(phone_number=phone_number)
+        return {
+            "expenses": list(
+                Expense.objects.filter(user=user)
+                .order_by("id")
+                .values_list("amount", "currency", "date", "category__name", "source_type")
+            ),
+            "balances": list(Account.objects.filter(user=user).values_list("name", "balance")),
+            "messages": list(Message.objects.filter(user=user).order_by("id").values_list("status", "parsed_intent")),
+            "rollups": list(
+                SpendRollup.objects.filter(user=user)
+                .order_by("period", "period_start", "category_name")
+                .values_list("period", "period_start", "category_name", "total", "expense_count")
+            ),
+        }
+
+    def test_async_view_matches_sync_view(self):
+        sync_responses = self.run_script(self.client.post, "/webhook/whatsapp/", "+15550007777")
+        async_responses = self.run_script(
+            async_to_sync(self.async_client.post), "/webhook/whatsapp/async/", "+15550008888"
+        )
+        self.assertEqual(async_responses, sync_responses)
+        self.assertEqual(
+            [status for status, _ in sync_responses], [200, 200, 200, 200, 200, 400, 400, 200, 200, 200, 200]
+        )
+        self.assertEqual(self.ledger("+15550008888"), self.ledger("+15550007777"))
+
+
+class MetricsViewTests(TestCase):
+    def get(self, path: str, token: str | None = None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        return self.client.get(path, **headers)
+
+    @override_settings(METRICS_TOKEN="scrape-token", DEBUG=False)
+    def test_token_is_required(self):
+        for path in ("/metrics", "/internal/metrics/"):
+            self.assertEqual(self.get(path).status_code, 403)
+            self.assertEqual(self.get(path, "wrong").status_code, 403)
+            self.assertEqual(self.get(path, "scrape-token").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="scrape-token", DEBUG=True)
+    def test_debug_does_not_bypass_a_configured_token(self):
+        self.assertEqual(self.get("/metrics").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_closed_without_token_outside_debug(self):
+        self.assertEqual(self.get("/metrics", "anything").status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_exposition_includes_request_and_backlog_metrics(self):
+        self.client.post("/webhook/whatsapp/", {"From": "+15550001212", "Body": "help", "demo": "1"})
+        response = self.get("/metrics", "scrape-token")
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertRegex(body, r'expense_bot_webhook_requests_total\{status="ok"\} [1-9]')
+        self.assertIn('expense_bot_messages{status="processed"} 1.0', body)
+        self.assertIn('expense_bot_outbound_messages{status="pending"} 0.0', body)
+
+
+class GunicornHookTests(SimpleTestCase):
+    def test_both_profiles_share_the_hooks(self):
+        for config in ("gunicorn.conf.py", "gunicorn.asgi.conf.py"):
+            namespace = runpy.run_path(os.path.join(settings.BASE_DIR, config))
+            self.assertIs(namespace["on_starting"], gunicorn_hooks.on_starting)
+            self.assertIs(namespace["child_exit"], gunicorn_hooks.child_exit)
+
+    def test_on_starting_resets_the_multiprocess_dir(self):
+        directory = os.path.join(tempfile.mkdtemp(), "prometheus")
+        self.addCleanup(shutil.rmtree, os.path.dirname(directory), ignore_errors=True)
+        os.makedirs(directory)
+        open(os.path.join(directory, "counter_123.db"), "w").close()
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+            gunicorn_hooks.on_starting(None)
+            with mock.patch("prometheus_client.multiprocess.mark_process_dead") as mark_dead:
+                gunicorn_hooks.child_exit(None, mock.Mock(pid=123))
+        self.assertEqual(os.listdir(directory), [])
+        mark_dead.assert_called_once_with(123)
+
+
+class UserCacheTests(TestCase):
+    phone_number = "+15550005555"
+
+    def setUp(self):
+        get_user_cache().clear()
+        self.addCleanup(get_user_cache().clear)
+
+    def post(self, body: str, message_id: str):
+        return self.client.post(
+            "/webhook/whatsapp/",
+            {"From": self.phone_number, "Body": body, "MessageSid": message_id, "demo": "1"},
+        )
+
+    def test_currency_changed_by_another_worker(self):
+        self.assertEqual(self.post("add account sbi account balance 1000", "account").status_code, 200)
+        # A queryset update sends no signals, like a save in another process.
+        WhatsAppUser.objects.filter(phone_number=self.phone_number).update(default_currency="usd")
+        self.assertEqual(get_or_create_user(self.phone_number).default_currency, "inr")
+
+        self.assertEqual(self.post("spent 100 on food from sbi account", "expense").status_code, 200)
+        self.assertEqual(Expense.objects.get(user__phone_number=self.phone_number).currency, "usd")
+        self.assertEqual(get_user_cache().stats()["misses"], 1)
+
+
+@override_settings(
+    TWILIO_ACCOUNT_SID="AC00000000000000000000000000000000",
+    TWILIO_AUTH_TOKEN="token",
+    TWILIO_VALIDATE_SIGNATURE=False,
+    WEBHOOK_PROCESSING_MODE="inline",
+)
+class WebhookIdempotencyTests(TestCase):
+    phone_number = "+15550006666"
+
+    def setUp(self):
+        get_recent_keys().clear()
+        self.addCleanup(get_recent_keys().clear)
+        get_user_cache().clear()
+        self.addCleanup(get_user_cache().clear)
+        _run_message(get_or_create_user(self.phone_number), "add account sbi account balance 1000")
+
+    def post(self, body: str, message_id: str):
+        return self.client.post("/webhook/whatsapp/", {"From": self.phone_number, "Body": body, "MessageSid": message_id})
+
+    @mock.patch("tracker.views.deliver_message")
+    def test_redelivered_message_sid_is_handled_once(self, deliver):
+        first = self.post("spent 100 on food from sbi account", "SM-redelivered")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.post("spent 100 on food from sbi account", "SM-redelivered").status_code, 200)
+        # The in-process key cache is per worker; a redelivery landing on
+        # another worker is caught by the unique key on Message instead.
+        get_recent_keys().clear()
+        second = self.post("spent 100 on food from sbi account", "SM-redelivered")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["message"], "Duplicate message ignored.")
+
+        self.assertEqual(Expense.objects.filter(user__phone_number=self.phone_number).count(), 1)
+        self.assertEqual(Message.objects.filter(user__phone_number=self.phone_number).count(), 1)
+        deliver.assert_called_once_with(self.phone_number, first.json()["message"])
+        self.assertEqual(Account.objects.get(user__phone_number=self.phone_number).balance, Decimal("900.00"))
+
+
+@override_settings(OUTBOUND_MAX_ATTEMPTS=3, OUTBOUND_BACKOFF_SECONDS=2.0, OUTBOUND_BACKOFF_MAX_SECONDS=3.0)
+class OutboundQueueTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        patcher = mock.patch("tracker.services.outbound.timezone.now", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sent = []
+        self.failures = {}
+        patcher = mock.patch("tracker.services.outbound.send_whatsapp_message", side_effect=self.fake_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_send(self, to_number: str, body: str) -> str:
+        if self.failures.get(body, 0):
+            self.failures[body] -= 1
+            raise RuntimeError(f"twilio down for {body}")
+        self.sent.append((to_number, body))
+        return f"SM{len(self.sent)}"
+
+    def enqueue(self, to_number: str, body: str) -> OutboundMessage:
+        message = enqueue_message(to_number, body)
+        OutboundMessage.objects.filter(pk=message.pk).update(next_attempt_at=self.now)
+        return message
+
+    def test_one_destination_is_sent_in_order(self):
+        for to_number, body in [("+1", "a1"), ("+2", "b1"), ("+1", "a2"), ("+1", "a3"), ("+2", "b2")]:
+            self.enqueue(to_number, body)
+        # Only the oldest unsent message per destination is claimable.
+        self.assertEqual(process_batch(), 2)
+        self.assertEqual(self.sent, [("+1", "a1"), ("+2", "b1")])
+        while process_batch():
+            pass
+        self.assertEqual([body for to_number, body in self.sent if to_number == "+1"], ["a1", "a2", "a3"])
+        self.assertEqual([body for to_number, body in self.sent if to_number == "+2"], ["b1", "b2"])
+        self.assertEqual(
+            list(OutboundMessage.objects.values_list("status", flat=True).distinct()), [OutboundMessage.STATUS_SENT]
+        )
+
+    def test_failed_send_backs_off_and_holds_later_messages(self):
+        first = self.enqueue("+1", "a1")
+        self.enqueue("+1", "a2")
+        self.failures["a1"] = 2
+
+        self.assertEqual(process_batch(), 1)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (OutboundMessage.STATUS_PENDING, 1))
+        self.assertEqual(first.next_attempt_at, self.now + timedelta(seconds=2))
+        self.assertEqual(first.last_error, "twilio down for a1")
+        # Neither the retry nor the next message goes out before the backoff.
+        self.assertEqual(process_batch(), 0)
+
+        self.now = first.next_attempt_at
+        self.assertEqual(process_batch(), 1)
+        first.refresh_from_db()
+        # Doubled, then capped by OUTBOUND_BACKOFF_MAX_SECONDS.
+        self.assertEqual(first.next_attempt_at, self.now + timedelta(seconds=3))
+
+        self.now = first.next_attempt_at
+        while process_batch():
+            pass
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.provider_sid), (OutboundMessage.STATUS_SENT, 3, "SM1"))
+        self.assertEqual(self.sent, [("+1", "a1"), ("+1", "a2")])
+
+    def test_gives_up_after_max_attempts(self):
+        first = self.enqueue("+1", "a1")
+        self.enqueue("+1", "a2")
+        self.failures["a1"] = 10
+        for _ in range(3):
+            self.assertEqual(process_batch(), 1)
+            self.now += timedelta(seconds=10)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (OutboundMessage.STATUS_FAILED, 3))
+        self.assertEqual(self.failures["a1"], 7)
+        # A message that gave up no longer blocks its destination.
+        self.assertEqual(process_batch(), 1)
+        self.assertEqual(self.sent, [("+1", "a2")])
+        self.assertEqual(process_batch(), 0)
+
+    def test_stale_lease_is_reclaimed(self):
+        message = self.enqueue("+1", "a1")
+        self.assertEqual(len(claim_messages(10)), 1)
+        self.assertEqual(claim_messages(10), [])
+        self.now += timedelta(seconds=settings.OUTBOUND_LEASE_SECONDS + 1)
+        self.assertEqual([claimed.id for claimed in claim_messages(10)], [message.id])
+
+
+class SendOutboundCommandTests(TransactionTestCase):
+    # The command's worker thread uses its own connection, so the queue has to
+    # be committed. One worker: SQLite's shared-cache table locks make several
+    # flaky, and cross-worker ordering is the claim rule tested above.
+    def test_worker_drains_the_queue_in_order(self):
+        for to_number, body in [("+1", "a1"), ("+2", "b1"), ("+1", "a2"), ("+1", "a3"), ("+2", "b2")]:
+            enqueue_message(to_number, body)
+        out = StringIO()
+        with mock.patch("tracker.services.outbound.send_whatsapp_message", return_value="SM1") as send:
+            call_command("send_outbound", "--once", "--workers", "1", "--batch-size", "2", stdout=out)
+        sent = [call.args for call in send.call_args_list]
+        self.assertEqual([body for to_number, body in sent if to_number == "+1"], ["a1", "a2", "a3"])
+        self.assertEqual([body for to_number, body in sent if to_number == "+2"], ["b1", "b2"])
+        self.assertIn("Processed 5 outbound message(s).", out.getvalue())
+        self.assertFalse(OutboundMessage.objects.exclude(status=OutboundMessage.STATUS_SENT).exists())
+
+
+class ImportJobEndToEndTests(TestCase):
+    phone_number = "+15550003333"
+
+    def setUp(self):
+        staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging_dir, ignore_errors=True)
+        override = override_settings(IMPORT_TOKEN="secret", IMPORT_STAGING_DIR=staging_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_user_cache().clear()
+        self.addCleanup(get_user_cache().clear)
+        self.user = get_or_create_user(self.phone_number)
+        _run_message(self.user, "add account sbi account balance 1000")
+        _run_message(self.user, "add card hdfc limit 50000 cycle 5 last4 1234")
+        self.auth = {"HTTP_AUTHORIZATION": "Bearer secret"}
+
+    def upload(self, content: str, **extra):
+        upload = SimpleUploadedFile("expenses.csv", content.encode(), content_type="text/csv")
+        return self.client.post("/internal/import/", {"file": upload, "phone": self.phone_number}, **extra)
+
+    def test_upload_then_worker_imports_rows(self):
+        response = self.upload(
+            "date,amount,category,source,source_type,card_last4,note\n"
+            "2026-03-05,100,food,sbi,account,,lunch\n"
+            "2026-03-05,25.50,food,hdfc,card,1234,\n"
+            "2026-03-20,40,fuel,sbi,account,,\n"
+            "2026-04-02,12,food,wallet,cash,,\n"
+            "2026-04-03,-5,food,sbi,account,,\n",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()["status_url"]
+        self.assertEqual(self.client.get(status_url, **self.auth).json()["status"], ImportJob.STATUS_PENDING)
+
+        out = StringIO()
+        call_command("process_imports", "--once", stdout=out)
+        self.assertIn("Processed 1 import job(s).", out.getvalue())
+
+        job = self.client.get(status_url, **self.auth).json()
+        self.assertEqual(job["status"], ImportJob.STATUS_DONE)
+        self.assertEqual((job["stats"]["rows"], job["stats"]["imported"], job["stats"]["skipped"]), (5, 4, 1))
+        self.assertEqual(job["stats"]["errors"], ["line 6: Amount must be greater than zero."])
+        self.assertFalse(os.path.exists(ImportJob.objects.get().path))
+
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list("date", "amount", "category__name", "note")),
+            [
+                (date(2026, 3, 5), Decimal("25.50"), "food", ""),
+                (date(2026, 3, 5), Decimal("100.00"), "food", "lunch"),
+                (date(2026, 3, 20), Decimal("40.00"), "fuel", ""),
+                (date(2026, 4, 2), Decimal("12.00"), "food", ""),
+            ],
+        )
+        balances = dict(Account.objects.filter(user=self.user).values_list("name", "balance"))
+        self.assertEqual(balances, {"sbi": Decimal("860.00"), "wallet": Decimal("-12.00")})
+        rollups = SpendRollup.objects.filter(user=self.user, period=SpendRollup.PERIOD_MONTH)
+        self.assertEqual(
+            {(row.period_start.isoformat(), row.category_name): (row.total, row.expense_count) for row in rollups},
+            {
+                ("2026-03-01", "food"): (Decimal("125.50"), 2),
+                ("2026-03-01", "fuel"): (Decimal("40.00"), 1),
+                ("2026-04-01", "food"): (Decimal("12.00"), 1),
+            },
+        )
+        self.assertEqual(rebuild_rollups(self.user), 0)
+        self.assertIn("125.50", _run_message(self.user, "summary by category for march 2026"))
+
+    def test_upload_is_checked_before_staging(self):
+        self.assertEqual(self.upload("date,amount\n2026-03-05,1\n").status_code, 404)
+        response = self.upload("date,amount\n2026-03-05,1\n", **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("category, source, source_type", response.json()["message"])
+        self.assertFalse(ImportJob.objects.exists())
+
+
+@override_settings(PUBLIC_BASE_URL="https://ledger.example", EXPORT_CHUNK_SIZE=2)
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.user = WhatsAppUser.objects.create(phone_number="+15550009999")
+        for text in [
+            "add account sbi account balance 1000",
+            "add card hdfc limit 50000 cycle 5 last4 1234",
+            "spent 100 on food from sbi account on 2026-03-05",
+            "spent 40.50 on fuel from hdfc card last4 1234 on 2026-03-01",
+            "spent 7 on tea from sbi account on 2026-03-05",
+            "add loan home amount 5000 description renovation",
+            "pay loan home amount 1500 on 2026-03-10",
+        ]:
+            _run_message(self.user, text)
+
+    def export_path(self, export_format: str) -> str:
+        reply = _run_message(self.user, f"export ledger as {export_format}")
+        return re.search(r"https://ledger\.example(/export/\S+/)", reply).group(1)
+
+    def download(self, export_format: str) -> str:
+        response = self.client.get(self.export_path(export_format))
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def expected_rows(self) -> list[dict]:
+        rows = [
+            {"record": "account", "id": str(account.id), "amount": str(account.balance), "source": account.name}
+            for account in Account.objects.filter(user=self.user).order_by("id")
+        ]
+        for expense in Expense.objects.filter(user=self.user).order_by("date", "id"):
+            rows.append(
+                {
+                    "record": "expense",
+                    "id": str(expense.id),
+                    "date": expense.date.isoformat(),
+                    "amount": str(expense.amount),
+                    "category": expense.category.name,
+                    "source_type": expense.source_type,
+                    "source": expense.source_account.name if expense.source_account else expense.source_card.issuer,
+                    "card_last4": expense.source_card.last4 if expense.source_card else "",
+                }
+            )
+        for loan in Loan.objects.filter(user=self.user):
+            for payment in loan.payments.order_by("paid_at", "id"):
+                rows.append({"record": "loan_payment", "id": str(payment.id), "amount": str(payment.amount)})
+        return rows
+
+    def assertMatchesLedger(self, records: list[dict]):
+        expected_rows = self.expected_rows()
+        self.assertEqual(len(records), len(expected_rows))
+        self.assertEqual(
+            [{key: str(record[key]) for key in expected} for record, expected in zip(records, expected_rows)],
+            expected_rows,
+        )
+
+    def test_csv_rows_match_the_ledger(self):
+        content = self.download("csv")
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(content.splitlines()[0], ",".join(EXPORT_COLUMNS))
+        self.assertEqual([row["record"] for row in rows], ["account"] + ["expense"] * 3 + ["loan_payment"])
+        self.assertEqual([row["amount"] for row in rows[1:4]], ["40.50", "100.00", "7.00"])
+        self.assertMatchesLedger(rows)
+
+    def test_json_rows_match_the_ledger(self):
+        records = json.loads(self.download("json"))
+        self.assertEqual(list(records[0]), list(EXPORT_COLUMNS))
+        self.assertMatchesLedger(records)
+
+    def test_async_download_matches_sync(self):
+        path = self.export_path("csv")
+
+        async def download():
+            response = await self.async_client.get(path)
+            return response.status_code, b"".join([chunk async for chunk in response.streaming_content])
+
+        status, content = async_to_sync(download)()
+        self.assertEqual(status, 200)
+        self.assertEqual(content.decode(), self.download("csv"))
+
+    def test_tampered_token_is_not_found(self):
+        path = self.export_path("csv")
+        token = path.split("/")[2]
+        other = WhatsAppUser.objects.create(phone_number="+15550009998")
+        forged = signing.dumps({"user": other.pk, "format": "csv"}, salt="another.salt")
+        for bad in (token[:-1] + ("A" if token[-1] != "A" else "B"), forged, "not-a-token"):
+            self.assertEqual(self.client.get(f"/export/{bad}/").status_code, 404)
+
+    def test_expired_token_is_not_found(self):
+        path = self.export_path("json")
+        later = time.time() + settings.EXPORT_LINK_MAX_AGE_SECONDS + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+
+class _SlowTwilioHandler(_FakeTwilioHandler):
+    delay = 0.5
+
+
+class _CountingTwilioHandler(_FakeTwilioHandler):
+    connections = 0
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+
+class TwilioTransportTests(SimpleTestCase):
+    def setUp(self):
+        _CountingTwilioHandler.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _CountingTwilioHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        overrides = override_settings(
+            TWILIO_API_BASE_URL=f"http://127.0.0.1:{self.server.server_port}",
+            TWILIO_ACCOUNT_SID="AC" + "0" * 32,
+            TWILIO_AUTH_TOKEN="fake-token",
+            TWILIO_HTTP_READ_TIMEOUT=0.2,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        twilio.reset_twilio_client()
+        self.addCleanup(twilio.reset_twilio_client)
+        twilio.transport_stats.reset()
+
+    def test_sends_reuse_one_connection(self):
+        for number in range(3):
+            self.assertTrue(twilio.send_whatsapp_message("whatsapp:+10000000000", f"hi {number}").startswith("SM"))
+        self.assertEqual(
+            twilio.transport_stats.snapshot(),
+            {"requests": 3, "connections_opened": 1, "connections_reused": 2},
+        )
+        self.assertEqual(_CountingTwilioHandler.connections, 1)
+
+    def test_read_timeout(self):
+        self.server.RequestHandlerClass = _SlowTwilioHandler
+        # The handler's late reply hits the closed socket; that is expected.
+        self.server.handle_error = lambda request, client_address: None
+        started = time.monotonic()
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            twilio.send_whatsapp_message("whatsapp:+10000000000", "slow")
+        self.assertLess(time.monotonic() - started, _SlowTwilioHandler.delay)
+
+    def test_client_rebuilt_after_fork(self):
+        client = twilio.get_twilio_client()
+        self.assertIs(twilio.get_twilio_client(), client)
+        with mock.patch.object(twilio.os, "getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(twilio.get_twilio_client(), client)
+
+    def test_async_client_is_shared_only_on_the_lifespan_loop(self):
+        async def send_three():
+            for number in range(3):
+                await twilio.asend_whatsapp_message("whatsapp:+10000000000", f"hi {number}")
+
+        async def lifespan_worker():
+            twilio.start_async_twilio_client()
+            client = twilio.get_async_twilio_client()
+            await send_three()
+            self.assertIs(twilio.get_async_twilio_client(), client)
+            await twilio.aclose_twilio_client()
+            return client
+
+        client = asyncio.run(lifespan_worker())
+        self.assertTrue(client.http_client.session._session.closed)
+        self.assertEqual(_CountingTwilioHandler.connections, 1)
+
+        # A loop the lifespan did not start (an async view under WSGI) keeps
+        # no session and goes through the pooled sync client.
+        asyncio.run(send_three())
+        self.assertIsNone(twilio._async_client)
+        self.assertEqual(twilio.transport_stats.snapshot()["requests"], 3)
@@ -1,8 +1,23 @@
 from django.urls import path
 
-from .views import demo_ui, whatsapp_webhook
+from .views import (
+    demo_ui,
+    import_status,
+    import_upload,
+    internal_metrics,
+    ledger_export,
+    prometheus_metrics,
+    whatsapp_webhook,
+    whatsapp_webhook_async,
+)
 
 urlpatterns = [
     path("webhook/whatsapp/", whatsapp_webhook, name="whatsapp-webhook"),
+    path("webhook/whatsapp/async/", whatsapp_webhook_async, name="whatsapp-webhook-async"),
     path("demo/", demo_ui, name="demo-ui"),
+    path("internal/metrics/", internal_metrics, name="internal-metrics"),
+    path("metrics", prometheus_metrics, name="prometheus-metrics"),
+    path("internal/import/", import_upload, name="import-upload"),
+    path("internal/import/<int:job_id>/", import_status, name="import-status"),
+    path("export/<str:token>/", ledger_export, name="ledger-export"),
 ]
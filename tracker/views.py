@@ -1,21 +1,52 @@
+import csv
 import hashlib
 import json
 import logging
 
+from asgiref.sync import sync_to_async
+
 from django.conf import settings
-from django.http import HttpResponseNotAllowed, JsonResponse, HttpResponseNotFound
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    HttpResponseNotFound,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
+from .services.batch import BATCH_INTENT, handle_batch, split_commands
 from .services.errors import IntentRoutingError, ValidationError
+from .services.exports import astream_ledger, stream_ledger, user_for_token
 from .services.handlers import handle_intent
+from .models import ImportJob
+from .services.imports import check_columns, stage_import
+from .services.instrumentation import annotate, instrument_webhook, registry, stage
+from .services.metrics import CONTENT_TYPE, render_metrics
 from .services.intent_router import route_intent
-from .services.twilio import is_twilio_configured, send_whatsapp_message, validate_twilio_request
+from .services.outbound import adeliver_message, deliver_message
+from .services.rate_limit import ais_throttled, is_throttled
+from .services.scheduler import serialized_for_user
+from .services.twilio import is_twilio_configured, validate_twilio_request
 from .services.validation import validate_payload
-from .services.webhook import ensure_message, get_or_create_user, mark_message
+from .services.webhook import (
+    aensure_message,
+    aget_or_create_user,
+    amark_message,
+    ensure_message,
+    get_or_create_user,
+    mark_message,
+)
 
 logger = logging.getLogger(__name__)
 
+THROTTLED_REPLY = "Too many messages. Please wait a moment and try again."
+
 
 def _mask_sender(sender: str | None) -> str | None:
     if not sender:
@@ -50,7 +81,16 @@ def _build_idempotency_key(message_id: str | None, sender: str, text: str) -> st
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
+def _throttled_response(payload) -> JsonResponse:
+    # Answered before any user or message rows are touched, and without a
+    # Twilio reply, so a flooding sender costs almost nothing.
+    logger.warning("Rate limited webhook: %s", _summarize_payload(payload))
+    annotate(outcome="throttled")
+    return JsonResponse({"status": "error", "message": THROTTLED_REPLY}, status=429)
+
+
 @csrf_exempt
+@instrument_webhook
 def whatsapp_webhook(request):
     if request.method != "POST":
         logger.warning("Webhook called with invalid method: %s", request.method)
@@ -70,16 +110,33 @@ def whatsapp_webhook(request):
         logger.error("Webhook missing sender or message: %s", _summarize_payload(payload))
         return JsonResponse({"status": "error", "message": "Missing sender or message."}, status=400)
 
+    if is_throttled(sender, message_text):
+        return _throttled_response(payload)
+
     user = get_or_create_user(sender)
     idempotency_key = _build_idempotency_key(message_id, sender, message_text)
 
     try:
         message = ensure_message(user, message_text, idempotency_key)
-        intent, data = route_intent(message_text)
-        validate_payload(intent, data, user)
-        response_text = handle_intent(user, intent, data)
+        if settings.WEBHOOK_PROCESSING_MODE == "queue" and not demo_mode:
+            return JsonResponse({"status": "queued"})
+        lines = split_commands(message_text)
+        if len(lines) > 1:
+            intent = BATCH_INTENT
+            with stage("handle"):
+                response_text = handle_batch(user, lines)
+            annotate(intent=intent, pattern_name=None)
+        else:
+            with stage("parse"):
+                intent, command = route_intent(message_text)
+            with serialized_for_user(user):
+                with stage("validate"):
+                    validate_payload(intent, command, user)
+                with stage("handle"):
+                    response_text = handle_intent(user, intent, command)
         if not demo_mode and is_twilio_configured():
-            send_whatsapp_message(sender, response_text)
+            with stage("send"):
+                deliver_message(sender, response_text)
         mark_message(message, "processed", intent)
         return JsonResponse({"status": "ok", "message": response_text})
     except (IntentRoutingError, ValidationError) as exc:
@@ -93,12 +150,16 @@ def whatsapp_webhook(request):
         )
         payload = {"status": "error", "message": str(exc)}
         status = 400
-        if str(exc).lower().startswith("duplicate message"):
+        duplicate = str(exc).lower().startswith("duplicate message")
+        if duplicate:
+            # A redelivery of a message already answered: acknowledge it to
+            # Twilio without sending the user a second reply.
             payload["status"] = "ok"
             status = 200
-        if sender and not demo_mode and is_twilio_configured():
+            annotate(outcome="duplicate")
+        if sender and not duplicate and not demo_mode and is_twilio_configured():
             try:
-                send_whatsapp_message(sender, payload["message"])
+                deliver_message(sender, payload["message"])
             except Exception:
                 logger.exception("Failed to send Twilio error response.")
         return JsonResponse(payload, status=status)
@@ -112,12 +173,190 @@ def whatsapp_webhook(request):
         error_text = "Sorry, something went wrong. Please try again."
         if sender and not demo_mode and is_twilio_configured():
             try:
-                send_whatsapp_message(sender, error_text)
+                deliver_message(sender, error_text)
             except Exception:
                 logger.exception("Failed to send Twilio error response.")
         return JsonResponse({"status": "error", "message": str(exc)}, status=502)
 
 
+def _validate_and_handle(user, intent: str, command) -> str:
+    with serialized_for_user(user):
+        with stage("validate"):
+            validate_payload(intent, command, user)
+        with stage("handle"):
+            return handle_intent(user, intent, command)
+
+
+async def _asend_reply(sender: str, text: str):
+    try:
+        await adeliver_message(sender, text)
+    except Exception:
+        logger.exception("Failed to send Twilio error response.")
+
+
+@csrf_exempt
+@instrument_webhook
+async def whatsapp_webhook_async(request):
+    if request.method != "POST":
+        logger.warning("Webhook called with invalid method: %s", request.method)
+        return HttpResponseNotAllowed(["POST"])
+
+    payload = _get_payload(request)
+    logger.info("Incoming WhatsApp webhook: %s", _summarize_payload(payload))
+    demo_mode = payload.get("demo") in ("1", "true", "yes")
+    if settings.TWILIO_VALIDATE_SIGNATURE and not demo_mode and not validate_twilio_request(request):
+        logger.warning("Rejected webhook due to invalid Twilio signature: %s", _summarize_payload(payload))
+        return JsonResponse({"status": "error", "message": "Invalid Twilio signature."}, status=403)
+    message_text = payload.get("Body") or payload.get("message") or payload.get("text")
+    sender = payload.get("From") or payload.get("from") or payload.get("phone")
+    message_id = payload.get("MessageSid") or payload.get("message_id") or payload.get("id")
+
+    if not message_text or not sender:
+        logger.error("Webhook missing sender or message: %s", _summarize_payload(payload))
+        return JsonResponse({"status": "error", "message": "Missing sender or message."}, status=400)
+
+    if await ais_throttled(sender, message_text):
+        return _throttled_response(payload)
+
+    send_replies = not demo_mode and is_twilio_configured()
+    user = await aget_or_create_user(sender)
+    idempotency_key = _build_idempotency_key(message_id, sender, message_text)
+    message = None
+    intent = None
+
+    try:
+        message = await aensure_message(user, message_text, idempotency_key)
+        if settings.WEBHOOK_PROCESSING_MODE == "queue" and not demo_mode:
+            return JsonResponse({"status": "queued"})
+        lines = split_commands(message_text)
+        if len(lines) > 1:
+            intent = BATCH_INTENT
+            with stage("handle"):
+                response_text = await sync_to_async(handle_batch)(user, lines)
+            annotate(intent=intent, pattern_name=None)
+        else:
+            with stage("parse"):
+                intent, command = route_intent(message_text)
+            # The service layer is synchronous; each request gets its own thread
+            # under ASGI, so this does not serialize concurrent conversations.
+            response_text = await sync_to_async(_validate_and_handle)(user, intent, command)
+        if send_replies:
+            with stage("send"):
+                await adeliver_message(sender, response_text)
+        await amark_message(message, "processed", intent)
+        return JsonResponse({"status": "ok", "message": response_text})
+    except (IntentRoutingError, ValidationError) as exc:
+        if message is not None:
+            await amark_message(message, "rejected")
+        logger.warning(
+            "Validation error for message %s (intent=%s): %s",
+            message.id if message is not None else "unknown",
+            intent or "unknown",
+            exc,
+        )
+        payload = {"status": "error", "message": str(exc)}
+        status = 400
+        duplicate = str(exc).lower().startswith("duplicate message")
+        if duplicate:
+            payload["status"] = "ok"
+            status = 200
+            annotate(outcome="duplicate")
+        if send_replies and not duplicate:
+            await _asend_reply(sender, payload["message"])
+        return JsonResponse(payload, status=status)
+    except Exception as exc:
+        if message is not None:
+            await amark_message(message, "failed")
+        logger.exception(
+            "Unhandled webhook error for payload %s",
+            _summarize_payload(payload),
+        )
+        if send_replies:
+            await _asend_reply(sender, "Sorry, something went wrong. Please try again.")
+        return JsonResponse({"status": "error", "message": str(exc)}, status=502)
+
+
+def _metrics_allowed(request) -> bool:
+    token = settings.METRICS_TOKEN
+    if token:
+        return request.headers.get("Authorization", "") == f"Bearer {token}"
+    return settings.DEBUG
+
+
+def internal_metrics(request):
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return JsonResponse({"histograms": registry.snapshot()})
+
+
+def prometheus_metrics(request):
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def _import_authorized(request) -> bool:
+    token = settings.IMPORT_TOKEN
+    return bool(token) and request.headers.get("Authorization", "") == f"Bearer {token}"
+
+
+def _import_job_payload(job: ImportJob) -> dict:
+    return {
+        "job": job.pk,
+        "status": job.status,
+        "stats": job.stats,
+        "error": job.error,
+        "status_url": reverse("import-status", args=[job.pk]),
+    }
+
+
+@csrf_exempt
+def import_upload(request):
+    if not _import_authorized(request):
+        return HttpResponseNotFound()
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    upload = request.FILES.get("file")
+    phone_number = request.POST.get("phone")
+    if not upload or not phone_number:
+        return JsonResponse({"status": "error", "message": "Missing file or phone."}, status=400)
+    # Only the header is checked here; the rows are imported by the
+    # process_imports worker so a large file never runs into the request
+    # timeout.
+    try:
+        check_columns(next(csv.reader([upload.file.readline().decode("utf-8-sig")]), None))
+    except (ValidationError, UnicodeDecodeError) as exc:
+        return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+    upload.file.seek(0)
+    job = stage_import(get_or_create_user(phone_number), upload)
+    return JsonResponse(_import_job_payload(job), status=202)
+
+
+def import_status(request, job_id):
+    if not _import_authorized(request):
+        return HttpResponseNotFound()
+    job = ImportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return HttpResponseNotFound()
+    return JsonResponse(_import_job_payload(job))
+
+
+def ledger_export(request, token):
+    resolved = user_for_token(token)
+    if resolved is None:
+        return HttpResponseNotFound()
+    user, export_format = resolved
+    content_type = "application/json" if export_format == "json" else "text/csv"
+    if isinstance(request, ASGIRequest):
+        content = astream_ledger(user, export_format)
+    else:
+        content = stream_ledger(user, export_format)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"ledger-{timezone.localdate().isoformat()}.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 def demo_ui(request):
     if not settings.DEBUG:
         return HttpResponseNotFound()